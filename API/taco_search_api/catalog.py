@@ -0,0 +1,49 @@
+"""
+Catálogo TACO em memória, imutável.
+
+A tabela só muda quando o data_import.py roda, então o main.py carrega tudo
+uma vez (junto com o índice de busca) e troca o catálogo inteiro quando a
+versão publicada em meta_collection muda. Cada alimento já fica serializado
+em JSON: /taco_table não consulta o Mongo nem serializa nada por requisição.
+
+`version` é um hash do conteúdo, usado como ETag: muda se e somente se algum
+alimento mudar, mesmo que a importação não tenha publicado versão.
+"""
+
+from types import MappingProxyType
+from responses import dumps
+import hashlib
+
+NUTRIENT_FIELDS = ("calorias_kcal", "proteinas_g", "gordura_g", "carbo_g")
+
+
+def food_payload(food: dict) -> dict:
+    # arredonda uma vez por campo (antes: json_encoders do modelo, por float)
+    payload = {"_id": food["_id"], "description": food.get("description", "")}
+    for field in NUTRIENT_FIELDS:
+        value = food.get(field)
+        payload[field] = round(value, 4) if isinstance(value, (int, float)) else None
+    payload["date"] = food.get("date")
+    return payload
+
+
+class TacoCatalog:
+    def __init__(self, foods=()):
+        payloads = sorted((food_payload(food) for food in foods), key=lambda p: p["_id"])
+        rendered = {payload["_id"]: dumps(payload) for payload in payloads}
+
+        digest = hashlib.sha1()
+        for body in rendered.values():
+            digest.update(body)
+        self.version = digest.hexdigest()[:16]
+        self._rendered = MappingProxyType(rendered)
+
+    def __len__(self) -> int:
+        return len(self._rendered)
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}"'
+
+    def get_json(self, food_id: int) -> bytes | None:
+        return self._rendered.get(food_id)
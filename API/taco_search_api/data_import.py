@@ -1,69 +1,214 @@
-import pandas as pd
+"""
+Importação da tabela TACO (xlsx) para o MongoDB.
+
+A coleção nunca fica vazia nem pela metade para a API:
+- os registros passam em fluxo, em lotes de IMPORT_CHUNK_SIZE: cada lote é
+  comparado com o que já está no banco e só as linhas que mudaram são gravadas
+  (bulk_write com upsert por _id); as que sumiram da planilha são removidas no
+  fim. A versão (hash dos registros) é calculada no mesmo passo, sem montar a
+  lista inteira;
+- a API serve busca e /taco_table de um catálogo em memória e só o troca
+  quando a versão publicada em meta muda, o que acontece depois da última
+  escrita. A troca é atômica do ponto de vista de quem consulta.
+
+Cada registro já leva os campos de busca normalizados (search_text e
+search_tokens), para que a API não normalize descrições ao montar o índice.
+
+O parse do Excel é lento; a planilha é lida linha a linha (openpyxl em modo
+read_only, sem DataFrame) e o resultado fica em TACO_PARSE_CACHE_DIR como JSON
+colunar, com o hash do xlsx no nome, e reimportações do mesmo arquivo o reusam.
+A cópia colunar é a única parte que fica inteira em memória.
+"""
+
+import openpyxl
 import pymongo
+from pymongo import ReplaceOne
+import datetime
+import hashlib
+import json
 import os
 from dotenv import load_dotenv
+from text_utils import search_fields
+
+NECESSARY_COLUMNS = {
+    "Número do Alimento": "_id",
+    "Descrição dos alimentos": "description",
+    "Energia": "calorias_kcal",
+    "Proteína": "proteinas_g",
+    "Lipídeos": "gordura_g",
+    "Carboidrato": "carbo_g",
+}
+COLUMNS_PER_GRAM = ["calorias_kcal", "proteinas_g", "gordura_g", "carbo_g"]
+
+def versioned(records, digest):
+    # passa os registros adiante somando-os ao hash: o mesmo que
+    # sha1(json.dumps(lista)), sem guardar a lista
+    digest.update(b"[")
+    for position, record in enumerate(records):
+        if position:
+            digest.update(b", ")
+        digest.update(json.dumps(record, sort_keys=True, default=str).encode("utf-8"))
+        yield record
+    digest.update(b"]")
+
+def publish_version(db, meta_collection_name: str, version: str):
+    # a API observa este documento e recarrega índice/cache da TACO quando muda
+    db[meta_collection_name].update_one(
+        {"_id": "taco"},
+        {"$set": {"version": version, "updated_at": datetime.datetime.now(datetime.timezone.utc)}},
+        upsert=True
+    )
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _number(value) -> float | None:
+    # "NA", "Tr", "*" e células vazias da TACO viram None
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return None if value != value else float(value)
+    try:
+        number = float(str(value).strip())
+    except ValueError:
+        return None
+    return None if number != number else number
+
+def read_rows(excel_path: str):
+    """Linhas da planilha (só as colunas usadas, por grama), lidas em fluxo."""
+    print(f"Reading Excel file '{excel_path}'...")
+    # se der erro de engine, certifique-se de ter o openpyxl instalado
+    workbook = openpyxl.load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(name) if name is not None else None for name in next(rows, ())]
+        print("Columns found:", [name for name in header if name])
+
+        missing = [c for c in NECESSARY_COLUMNS if c not in header]
+        if missing:
+            raise ValueError(f"Missing expected columns in Excel: {missing}")
+        positions = {field: header.index(column) for column, field in NECESSARY_COLUMNS.items()}
+
+        for values in rows:
+            row = {field: values[position] if position < len(values) else None
+                   for field, position in positions.items()}
+            food_id = _number(row["_id"])
+            if food_id is None:
+                continue
+            row["_id"] = int(food_id)
+            if row["description"] is not None:
+                row["description"] = str(row["description"])
+            for col in COLUMNS_PER_GRAM:
+                value = _number(row[col])
+                row[col] = None if value is None else value / 100.0
+            yield row
+    finally:
+        workbook.close()
+
+def parse_excel(excel_path: str) -> dict[str, list]:
+    columns = {field: [] for field in NECESSARY_COLUMNS.values()}
+    for row in read_rows(excel_path):
+        for field, values in columns.items():
+            values.append(row[field])
+    return columns
+
+def load_columns(excel_path: str, cache_dir: str | None) -> dict[str, list]:
+    """Colunas da planilha já tratadas, do cache quando o xlsx não mudou."""
+    if not cache_dir:
+        return parse_excel(excel_path)
+
+    cache_path = os.path.join(cache_dir, f"taco-{file_hash(excel_path)[:16]}.json")
+    if os.path.exists(cache_path):
+        print(f"Using parsed copy '{cache_path}'.")
+        with open(cache_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    columns = parse_excel(excel_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(columns, f, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+    return columns
+
+def iter_records(columns: dict[str, list]):
+    names = list(columns)
+    for values in zip(*(columns[name] for name in names)):
+        record = dict(zip(names, values))
+        record.update(search_fields(record["description"]))
+        yield record
+
+def sync_chunk(collection, records: list[dict]) -> int:
+    # lê só os documentos do lote e grava apenas os que mudaram
+    stored = {doc["_id"]: doc for doc in collection.find({"_id": {"$in": [r["_id"] for r in records]}})}
+    operations = [
+        ReplaceOne({"_id": record["_id"]}, record, upsert=True)
+        for record in records
+        if stored.get(record["_id"]) != record
+    ]
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+    return len(operations)
+
+def sync_collection(collection, records, chunk_size: int) -> dict:
+    ids = []
+    changed = 0
+    chunk = []
+    for record in records:
+        ids.append(record["_id"])
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            changed += sync_chunk(collection, chunk)
+            chunk = []
+    if chunk:
+        changed += sync_chunk(collection, chunk)
+
+    removed = collection.delete_many({"_id": {"$nin": ids}}).deleted_count if ids else 0
+    return {"total": len(ids), "changed": changed, "removed": removed}
 
 def import_to_mongo():
     load_dotenv()
     mongo_uri = os.getenv("MONGO_URI")
     db_name   = os.getenv("DB_NAME")
     collection_name = os.getenv("COLLECTION_NAME")
+    meta_collection_name = os.getenv("COLLECTION_NAME6", "catalog_meta")
+    chunk_size = int(os.getenv("IMPORT_CHUNK_SIZE", "200"))
+    cache_dir = os.getenv("TACO_PARSE_CACHE_DIR", ".taco-cache")
 
     if not all([mongo_uri, db_name, collection_name]):
         print("Error: variables MONGO_URI, DB_NAME, COLLECTION_NAME need to be filled.")
         return
 
+    excel_path = "Taco-4a-Edicao.xlsx"
+    if not os.path.exists(excel_path):
+        raise FileNotFoundError(f"Excel file not found: {excel_path}")
+
+    columns = load_columns(excel_path, cache_dir)
+    if not columns["_id"]:
+        # planilha vazia: melhor manter a tabela atual do que apagá-la
+        print("No data to import.")
+        return
+
     print("Connecting to MongoDB...")
     client = pymongo.MongoClient(mongo_uri)
     db = client[db_name]
     collection = db[collection_name]
     print("Successfully connected!")
 
-    excel_path = "Taco-4a-Edicao.xlsx"
-    if not os.path.exists(excel_path):
-        raise FileNotFoundError(f"Excel file not found: {excel_path}")
+    print("Syncing changed rows...")
+    digest = hashlib.sha1()
+    result = sync_collection(collection, versioned(iter_records(columns), digest), chunk_size)
+    print(f"{result['total']} records processed: {result['changed']} rows written, "
+          f"{result['removed']} removed ({result['total'] - result['changed']} unchanged).")
 
-    print(f"Reading Excel file '{excel_path}'...")
-    # se der erro de engine, certifique-se de ter o openpyxl instalado:
-    df = pd.read_excel(excel_path, engine="openpyxl")
-
-    print("Columns found:", list(df.columns))
-
-    necessary_columns = {
-        "Número do Alimento": "_id",
-        "Descrição dos alimentos": "description",
-        "Energia": "calorias_kcal",
-        "Proteína": "proteinas_g",
-        "Lipídeos": "gordura_g",
-        "Carboidrato": "carbo_g",
-    }
-
-    missing = [c for c in necessary_columns if c not in df.columns]
-    if missing:
-        raise ValueError(f"Missing expected columns in Excel: {missing}")
-
-    df = df[list(necessary_columns.keys())].rename(columns=necessary_columns)
-    df = df.dropna(subset=["_id"])
-    df["_id"] = df["_id"].astype(int)
-
-    columns_per_gram = ["calorias_kcal", "proteinas_g", "gordura_g", "carbo_g"]
-    for col in columns_per_gram:
-        df[col] = pd.to_numeric(df[col], errors="coerce") / 100.0
-
-    df = df.where(pd.notna(df), None)
-
-    data_to_insert = df.to_dict(orient="records")
-    print(f"{len(data_to_insert)} records processed.")
-
-    print("Cleaning existent collection...")
-    collection.delete_many({})
-
-    if data_to_insert:
-        print("Appending new data to collection...")
-        collection.insert_many(data_to_insert)
-        print("Data successfully imported to MongoDB!!")
-    else:
-        print("No data to insert.")
+    # publicada só depois da última escrita: é o que faz a API trocar o catálogo
+    version = digest.hexdigest()[:16]
+    publish_version(db, meta_collection_name, version)
+    print(f"Published TACO version {version}.")
 
 if __name__ == "__main__":
     import_to_mongo()
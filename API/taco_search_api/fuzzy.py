@@ -0,0 +1,187 @@
+"""
+Distância de edição limitada para a busca aproximada.
+
+A busca só quer saber se a distância é <= k (hoje k = 2), então não faz
+sentido montar a matriz inteira de programação dinâmica para cada candidato:
+
+- bounded_levenshtein: DP restrita à faixa diagonal de largura 2k+1, com
+  saída antecipada assim que a linha inteira passa de k;
+- MyersMatcher: algoritmo bit-paralelo de Myers/Hyyrö, que pré-processa a
+  consulta uma vez e pontua cada candidato (ou o melhor prefixo dele, em
+  min_prefix_distance) com O(len(texto)) operações sobre inteiros.
+
+Ambos devolvem a distância real (para ranking) ou None quando ela passa de k.
+
+BKTree indexa o vocabulário (palavras) do índice de busca: acha as palavras a
+até k edições de uma palavra da consulta visitando só uma fração da árvore.
+"""
+
+
+def levenshtein_distance(a: str, b: str) -> int:
+    if a == b:
+        return 0
+    if len(a) == 0:
+        return len(b)
+    if len(b) == 0:
+        return len(a)
+    return MyersMatcher(a).distance(b)
+
+
+def bounded_levenshtein(a: str, b: str, max_distance: int) -> int | None:
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    if len(a) > len(b):
+        a, b = b, a
+    if len(a) == 0:
+        return len(b)
+
+    over = max_distance + 1
+    previous_row = [j if j <= max_distance else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        ca = a[i - 1]
+        lo = max(1, i - max_distance)
+        hi = min(len(b), i + max_distance)
+        current_row = [over] * (len(b) + 1)
+        current_row[0] = i if i <= max_distance else over
+        row_min = current_row[0] if lo == 1 else over
+        for j in range(lo, hi + 1):
+            cost = previous_row[j - 1] + (ca != b[j - 1])
+            if previous_row[j] + 1 < cost:
+                cost = previous_row[j] + 1
+            if current_row[j - 1] + 1 < cost:
+                cost = current_row[j - 1] + 1
+            if cost > over:
+                cost = over
+            current_row[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > max_distance:
+            return None
+        previous_row = current_row
+
+    distance = previous_row[len(b)]
+    return distance if distance <= max_distance else None
+
+
+class MyersMatcher:
+    """Consulta pré-processada para o cálculo bit-paralelo (Hyyrö, 2001)."""
+
+    def __init__(self, query: str):
+        self.query = query
+        self._size = len(query)
+        self._mask = (1 << self._size) - 1
+        self._high = 1 << (self._size - 1) if self._size else 0
+        self._peq: dict[str, int] = {}
+        for i, char in enumerate(query):
+            self._peq[char] = self._peq.get(char, 0) | (1 << i)
+
+    def distance(self, text: str, max_distance: int | None = None) -> int | None:
+        size = self._size
+        if size == 0:
+            return len(text) if max_distance is None or len(text) <= max_distance else None
+        if max_distance is not None and abs(len(text) - size) > max_distance:
+            return None
+
+        peq, mask, high = self._peq, self._mask, self._high
+        vp, vn, score = mask, 0, size
+        remaining = len(text)
+        for char in text:
+            eq = peq.get(char, 0)
+            xv = eq | vn
+            xh = (((eq & vp) + vp) ^ vp) | eq
+            ph = vn | (~(xh | vp) & mask)
+            mh = vp & xh
+            if ph & high:
+                score += 1
+            elif mh & high:
+                score -= 1
+            remaining -= 1
+            # o placar cai no máximo 1 por caractere restante
+            if max_distance is not None and score - remaining > max_distance:
+                return None
+            ph = ((ph << 1) | 1) & mask
+            mh = (mh << 1) & mask
+            vp = mh | (~(xv | ph) & mask)
+            vn = ph & xv
+
+        if max_distance is not None and score > max_distance:
+            return None
+        return score
+
+    def min_prefix_distance(self, text: str, max_distance: int) -> int | None:
+        """Menor distância entre a consulta e algum prefixo de `text`."""
+        size = self._size
+        best = size  # prefixo vazio
+        if size == 0:
+            return 0
+
+        peq, mask, high = self._peq, self._mask, self._high
+        vp, vn, score = mask, 0, size
+        # prefixos com mais de size + k caracteres não ficam a k edições
+        for char in text[:size + max_distance]:
+            eq = peq.get(char, 0)
+            xv = eq | vn
+            xh = (((eq & vp) + vp) ^ vp) | eq
+            ph = vn | (~(xh | vp) & mask)
+            mh = vp & xh
+            if ph & high:
+                score += 1
+            elif mh & high:
+                score -= 1
+            if score < best:
+                best = score
+            ph = ((ph << 1) | 1) & mask
+            mh = (mh << 1) & mask
+            vp = mh | (~(xv | ph) & mask)
+            vn = ph & xv
+
+        return best if best <= max_distance else None
+
+
+class BKTree:
+    """Árvore BK (Burkhard-Keller) de palavras pela distância de Levenshtein."""
+
+    def __init__(self):
+        # nó: (palavra, {distância até o pai: filho})
+        self._root: tuple[str, dict] | None = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, word: str):
+        if self._root is None:
+            self._root = (word, {})
+            self._size = 1
+            return
+        node_word, children = self._root
+        while True:
+            distance = levenshtein_distance(word, node_word)
+            if distance == 0:
+                return
+            child = children.get(distance)
+            if child is None:
+                children[distance] = (word, {})
+                self._size += 1
+                return
+            node_word, children = child
+
+    def search(self, word: str, max_distance: int) -> list[tuple[str, int]]:
+        """(palavra, distância) de todas as palavras a até `max_distance` edições."""
+        if self._root is None:
+            return []
+        found = []
+        stack = [self._root]
+        while stack:
+            node_word, children = stack.pop()
+            distance = levenshtein_distance(word, node_word)
+            if distance <= max_distance:
+                found.append((node_word, distance))
+            # desigualdade triangular: só filhos em [d - k, d + k] podem servir
+            for edge in range(distance - max_distance, distance + max_distance + 1):
+                child = children.get(edge)
+                if child is not None:
+                    stack.append(child)
+        return found
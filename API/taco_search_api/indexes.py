@@ -0,0 +1,127 @@
+"""
+Índices das coleções usadas pela API e verificação dos planos de consulta.
+
+ensure_indexes roda no startup (lifespan) e é idempotente: create_indexes não
+faz nada se o índice já existe com a mesma definição. explain_query_shapes
+roda explain() para o formato de consulta de cada endpoint e aponta varreduras
+completas (COLLSCAN); ver scripts/explain-queries.py.
+
+As chaves dos dicionários são nomes lógicos das coleções:
+daily_intake, historical_intake, daily_log, historical_log, recipes, rollups,
+log_days (só com FOOD_LOG_STORAGE=buckets, ver log_buckets.py).
+"""
+
+import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+INDEXES = {
+    # totais por dia: únicos, para que upserts concorrentes não dupliquem o dia
+    "daily_intake": [
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING)], name="user_date", unique=True),
+        IndexModel([("date", ASCENDING)], name="date"),
+    ],
+    "historical_intake": [
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING)], name="user_date", unique=True),
+        IndexModel([("date", ASCENDING)], name="date"),
+    ],
+    "daily_log": [
+        # listagem paginada do dia: filtro por usuário/dia, ordem e cursor por _id
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING), ("_id", ASCENDING)], name="user_date_id"),
+        # rollover: itens de um dia em ordem de _id
+        IndexModel([("date", ASCENDING), ("_id", ASCENDING)], name="date_id"),
+    ],
+    "historical_log": [
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING), ("_id", ASCENDING)], name="user_date_id"),
+        # reconciliação e distinct de usuários por dia no rollover
+        IndexModel([("date", ASCENDING), ("user_id", ASCENDING)], name="date_user"),
+    ],
+    "log_days": [
+        # um balde por dia: leitura pontual e upsert sem duplicar o dia
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING)], name="user_date", unique=True),
+        # update/delete de um item pelo _id dentro do balde
+        IndexModel([("items._id", ASCENDING)], name="items_id"),
+        IndexModel([("date", ASCENDING), ("user_id", ASCENDING)], name="date_user"),
+    ],
+    "recipes": [
+        # listagem paginada por _id
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)], name="user_id"),
+    ],
+    "rollups": [
+        IndexModel([("user_id", ASCENDING), ("granularity", ASCENDING), ("period", ASCENDING)],
+                   name="user_granularity_period", unique=True),
+        IndexModel([("user_id", ASCENDING), ("granularity", ASCENDING), ("start", ASCENDING)],
+                   name="user_granularity_start"),
+    ],
+}
+
+
+async def ensure_indexes(collections: dict) -> dict:
+    created = {}
+    for name, models in INDEXES.items():
+        collection = collections.get(name)
+        if collection is None:
+            continue
+        try:
+            created[name] = await collection.create_indexes(models)
+        except OperationFailure as e:
+            # ex.: dados antigos com (user_id, date) duplicado impedem o índice único;
+            # a API continua de pé e o problema aparece no log
+            print(f"[WARN] Não foi possível criar índices em '{name}': {e}")
+            created[name] = []
+    return created
+
+
+def query_shapes(user_id: str = "explain-user") -> list[tuple[str, str, dict, list]]:
+    """(endpoint, coleção, filtro, ordenação) das consultas que a API faz."""
+    today = datetime.date.today().isoformat()
+    week_ago = (datetime.date.today() - datetime.timedelta(days=7)).isoformat()
+    return [
+        ("/intake/today", "daily_intake", {"user_id": user_id, "date": today}, []),
+        ("/intake/history", "historical_intake", {"user_id": user_id, "date": {"$gte": week_ago}}, [("date", 1)]),
+        ("/intake/stats", "historical_intake",
+         {"user_id": user_id, "date": {"$gte": week_ago, "$lte": today}}, [("date", 1)]),
+        ("/intake/history?granularity=month", "rollups",
+         {"user_id": user_id, "granularity": "month", "start": {"$gte": week_ago}}, [("start", 1)]),
+        ("/food/daily", "daily_log", {"user_id": user_id, "date": today}, [("_id", 1)]),
+        ("/food/history/{date}", "historical_log", {"user_id": user_id, "date": week_ago}, [("_id", 1)]),
+        ("/cron/rollover", "daily_log", {"date": week_ago}, [("_id", 1)]),
+        ("/cron/reconcile", "historical_log", {"date": {"$gte": week_ago, "$lt": today}}, []),
+        ("/cron/reconcile", "historical_intake", {"date": {"$gte": week_ago, "$lt": today}}, []),
+        ("/recipes/list", "recipes", {"user_id": user_id}, [("_id", 1)]),
+        ("/food/daily (buckets)", "log_days", {"user_id": user_id, "date": today}, []),
+        ("/food/update (buckets)", "log_days", {"items._id": ObjectId()}, []),
+        ("/cron/reconcile (buckets)", "log_days", {"date": {"$gte": week_ago, "$lt": today}}, []),
+    ]
+
+
+def plan_stages(plan: dict) -> list[str]:
+    stages = [plan["stage"]] if "stage" in plan else []
+    for child_key in ("inputStage", "queryPlan"):
+        if child_key in plan:
+            stages += plan_stages(plan[child_key])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return stages
+
+
+async def explain_query_shapes(collections: dict, user_id: str = "explain-user") -> list[dict]:
+    report = []
+    for endpoint, name, query, sort in query_shapes(user_id):
+        collection = collections.get(name)
+        if collection is None:
+            continue
+        cursor = collection.find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        report.append({
+            "endpoint": endpoint,
+            "collection": name,
+            "filter": query,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+    return report
@@ -0,0 +1,126 @@
+"""
+Estatísticas de ingestão para dashboards (/intake/stats), vetorizadas com NumPy.
+
+Os totais diários do intervalo viram uma matriz dias x MACRO_FIELDS num eixo
+de dias contínuo; dia sem registro é NaN e fica fora de médias e percentis.
+- médias móveis: somas acumuladas de valores e de dias registrados, então cada
+  janela custa uma subtração, qualquer que seja o tamanho;
+- percentis: nanpercentile por coluna;
+- metas: aderência é |valor - meta| <= tolerância * meta, por dia registrado;
+- sequências: inícios e fins dos trechos verdadeiros saem de um diff da máscara.
+"""
+
+import datetime
+import numpy as np
+from nutrition import MACRO_FIELDS
+
+PERCENTILES = (10, 50, 90)
+# kcal por grama, para a divisão da energia entre os macros
+KCAL_PER_GRAM = {"proteinas": 4.0, "carbo": 4.0, "gordura": 9.0}
+
+
+def _rounded(values: np.ndarray, decimals: int = 2) -> list:
+    return [None if value != value else value for value in np.round(values, decimals).tolist()]
+
+
+def _scalar(value, decimals: int = 2):
+    value = float(value)
+    return None if value != value else round(value, decimals)
+
+
+def to_columns(days: list[dict], start: datetime.date, end: datetime.date) -> np.ndarray:
+    """Matriz (dias do intervalo x MACRO_FIELDS), NaN nos dias sem registro."""
+    size = (end - start).days + 1
+    matrix = np.full((size, len(MACRO_FIELDS)), np.nan)
+    if days:
+        positions = (np.array([day["date"] for day in days], dtype="datetime64[D]")
+                     - np.datetime64(start, "D")).astype(np.int64)
+        values = np.array([[day.get(field) for field in MACRO_FIELDS] for day in days], dtype=np.float64)
+        inside = (positions >= 0) & (positions < size)
+        matrix[positions[inside]] = values[inside]
+    return matrix
+
+
+def rolling_mean(matrix: np.ndarray, window: int) -> np.ndarray:
+    """Média de cada coluna nos dias registrados dos últimos `window` dias."""
+    logged = ~np.isnan(matrix)
+    sums = np.vstack([np.zeros((1, matrix.shape[1])), np.cumsum(np.where(logged, matrix, 0.0), axis=0)])
+    counts = np.vstack([np.zeros((1, matrix.shape[1])), np.cumsum(logged, axis=0)])
+    upper = np.arange(1, matrix.shape[0] + 1)
+    lower = np.maximum(upper - window, 0)
+    window_sums = sums[upper] - sums[lower]
+    window_counts = counts[upper] - counts[lower]
+    return np.divide(window_sums, window_counts, out=np.full(matrix.shape, np.nan), where=window_counts > 0)
+
+
+def streaks(mask: np.ndarray) -> dict:
+    """Maior sequência de dias verdadeiros e a atual (terminando no último dia)."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    lengths = ends - starts
+    if not lengths.size:
+        return {"longest": 0, "current": 0}
+    return {"longest": int(lengths.max()), "current": int(lengths[-1]) if ends[-1] == mask.size else 0}
+
+
+def compute_stats(days: list[dict], start: datetime.date, end: datetime.date, window: int,
+                  goals: dict[str, float], tolerance: float) -> dict:
+    matrix = to_columns(days, start, end)
+    logged = ~np.isnan(matrix).all(axis=1)
+    dates = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D") + 1).astype(str).tolist()
+
+    summary = {}
+    if logged.any():
+        values = matrix[logged]
+        means = np.nanmean(values, axis=0)
+        minimums = np.nanmin(values, axis=0)
+        maximums = np.nanmax(values, axis=0)
+        percentiles = np.nanpercentile(values, PERCENTILES, axis=0)
+        for column, field in enumerate(MACRO_FIELDS):
+            summary[field] = {
+                "mean": _scalar(means[column]),
+                "min": _scalar(minimums[column]),
+                "max": _scalar(maximums[column]),
+                **{f"p{p}": _scalar(percentiles[row, column]) for row, p in enumerate(PERCENTILES)},
+            }
+
+    # divisão da energia no intervalo inteiro (não média das divisões diárias)
+    totals = dict(zip(MACRO_FIELDS, np.nansum(matrix, axis=0).tolist()))
+    macro_kcal = {field: totals[field] * factor for field, factor in KCAL_PER_GRAM.items()}
+    energy = sum(macro_kcal.values())
+    ratios = {field: round(kcal / energy, 4) if energy > 0 else None for field, kcal in macro_kcal.items()}
+
+    rolling = rolling_mean(matrix, window)
+    result = {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "days": len(dates),
+        "logged_days": int(logged.sum()),
+        "summary": summary,
+        "ratios": ratios,
+        "rolling": {
+            "window": window,
+            "dates": dates,
+            **{field: _rounded(rolling[:, column]) for column, field in enumerate(MACRO_FIELDS)},
+        },
+        "streaks": {"logged": streaks(logged)},
+    }
+
+    if goals:
+        adherence = {}
+        on_goal = logged.copy()
+        for field, goal in goals.items():
+            column = matrix[:, MACRO_FIELDS.index(field)]
+            within = logged & (np.abs(np.nan_to_num(column) - goal) <= tolerance * goal)
+            on_goal &= within
+            hits = int(within.sum())
+            adherence[field] = {
+                "goal": goal,
+                "days_on_goal": hits,
+                "ratio": round(hits / int(logged.sum()), 4) if logged.any() else None,
+            }
+        result["adherence"] = {"tolerance": tolerance, **adherence}
+        result["streaks"]["on_goal"] = streaks(on_goal)
+
+    return result
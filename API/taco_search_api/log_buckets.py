@@ -0,0 +1,143 @@
+"""
+Modo opcional de armazenamento do diário alimentar em "baldes" por dia
+(FOOD_LOG_STORAGE=buckets no main.py).
+
+Em vez de um documento por item em daily_log/historical_log, cada
+(user_id, date) vira um único documento:
+
+    {user_id, date, items: [item, ...], totals: {calorias, ...}, count}
+
+- ler um dia é uma leitura pontual pelo índice único (user_id, date);
+- cada escrita mexe em `items` e em `totals` no mesmo update ($push, $pull,
+  $set posicional + $inc), então os totais embutidos nunca divergem dos itens;
+- não existe diário x histórico: o balde serve os dois e o rollover não move
+  nada.
+
+Update e delete leem o item e gravam com um filtro que exige os valores lidos
+($elemMatch); se outro request mudou o item no meio, tentam de novo. Mover um
+item de dia toca dois baldes: ele entra no novo antes de sair do antigo.
+"""
+
+from pymongo import UpdateOne
+from nutrition import MACRO_FIELDS
+
+MAX_RETRIES = 5
+
+
+class ConcurrentUpdateError(RuntimeError):
+    pass
+
+
+def _value(item: dict, field: str) -> float:
+    try:
+        value = float(item.get(field) or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+    return value if value == value else 0.0
+
+
+def _totals_inc(items: list[dict], sign: float = 1.0) -> dict:
+    return {f"totals.{field}": sign * sum(_value(item, field) for item in items) for field in MACRO_FIELDS}
+
+
+def _guard(item: dict) -> dict:
+    # o item precisa estar como foi lido (mesmo _id e mesmos macros)
+    return {"items": {"$elemMatch": {"_id": item["_id"], **{field: item.get(field) for field in MACRO_FIELDS}}}}
+
+
+def add_operations(items: list[dict]) -> list[UpdateOne]:
+    by_day = {}
+    for item in items:
+        by_day.setdefault((item["user_id"], item["date"]), []).append(item)
+    return [
+        UpdateOne(
+            {"user_id": user_id, "date": date},
+            {"$push": {"items": {"$each": day_items}},
+             "$inc": {**_totals_inc(day_items), "count": len(day_items)}},
+            upsert=True
+        )
+        for (user_id, date), day_items in by_day.items()
+    ]
+
+
+async def add_items(collection, items: list[dict]):
+    operations = add_operations(items)
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+
+
+async def find_item(collection, item_id) -> dict | None:
+    bucket = await collection.find_one({"items._id": item_id}, {"items": {"$elemMatch": {"_id": item_id}}})
+    return bucket["items"][0] if bucket and bucket.get("items") else None
+
+
+async def day_items(collection, user_id: str, date: str) -> list[dict]:
+    bucket = await collection.find_one({"user_id": user_id, "date": date}, {"items": 1})
+    return bucket.get("items", []) if bucket else []
+
+
+async def _pull_if_unchanged(collection, item: dict) -> bool:
+    result = await collection.update_one(
+        {"user_id": item["user_id"], "date": item["date"], **_guard(item)},
+        {"$pull": {"items": {"_id": item["_id"]}}, "$inc": {**_totals_inc([item], -1.0), "count": -1}}
+    )
+    return result.modified_count == 1
+
+
+async def update_item(collection, item_id, updates: dict) -> tuple[dict, dict] | None:
+    """(antes, depois) do item atualizado, ou None se ele não existe."""
+    for _ in range(MAX_RETRIES):
+        old = await find_item(collection, item_id)
+        if old is None:
+            return None
+        new = {**old, **updates}
+
+        if (new["user_id"], new["date"]) != (old["user_id"], old["date"]):
+            # mudou de dia (ou de usuário): entra no balde novo antes de sair do
+            # antigo, então uma falha no meio duplica o item em vez de perdê-lo
+            await add_items(collection, [new])
+            if await _pull_if_unchanged(collection, old):
+                return old, new
+            # o item mudou no meio: desfaz a entrada no balde novo e tenta de novo
+            await _pull_if_unchanged(collection, new)
+            continue
+
+        delta = {
+            f"totals.{field}": _value(new, field) - _value(old, field) for field in MACRO_FIELDS
+        }
+        result = await collection.update_one(
+            {"user_id": old["user_id"], "date": old["date"], **_guard(old)},
+            {"$set": {f"items.$.{key}": value for key, value in updates.items()}, "$inc": delta}
+        )
+        if result.matched_count == 1:
+            return old, new
+    raise ConcurrentUpdateError(f"Item {item_id} changed concurrently")
+
+
+async def delete_item(collection, item_id) -> dict | None:
+    """O item removido, ou None se ele não existe."""
+    for _ in range(MAX_RETRIES):
+        old = await find_item(collection, item_id)
+        if old is None:
+            return None
+        if await _pull_if_unchanged(collection, old):
+            return old
+    raise ConcurrentUpdateError(f"Item {item_id} changed concurrently")
+
+
+async def iter_items(collection, match: dict):
+    """Itens dos baldes que casam com `match` (filtros por user_id/date)."""
+    async for bucket in collection.find(match, {"items": 1}):
+        for item in bucket.get("items", []):
+            yield item
+
+
+def bucket_document(user_id: str, date: str, items: list[dict]) -> dict:
+    items = sorted(items, key=lambda item: item["_id"])
+    return {
+        "user_id": user_id,
+        "date": date,
+        "items": items,
+        "totals": {field: sum(_value(item, field) for item in items) for field in MACRO_FIELDS},
+        "count": len(items),
+    }
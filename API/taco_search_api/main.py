@@ -1,21 +1,62 @@
 # --- 1. IMPORTS ---
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Header
+from typing import Literal
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field, ConfigDict
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response
 from bson import ObjectId
-from unidecode import unidecode
+from pymongo import UpdateOne, ReturnDocument
+from contextlib import asynccontextmanager, contextmanager
+from collections import Counter
+from search_index import SearchIndex, could_match, rank_key
+from cache import TTLCache
+from singleflight import SingleFlight
+from indexes import ensure_indexes
+from metrics import registry, CallbackMetric, MetricsMiddleware, MongoCommandListener
+from profiling import ProfilingMiddleware
+from text_utils import normalize_text, search_fields, stored_search_fields
+from responses import FastJSONResponse, dumps
+from catalog import TacoCatalog, food_payload, NUTRIENT_FIELDS
+from nutrition import NutrientMatrix, MACRO_FIELDS
+from trie import PrefixTrie, TOP_K
+from pagination import fetch_page, slice_page, decode_cursor, InvalidCursor, NEXT_CURSOR_HEADER
+import log_buckets
+from write_behind import WriteBehind
+from intake_stats import compute_stats
 import motor.motor_asyncio
 import asyncio
+import hashlib
+import heapq
+import itertools
 import os
-import re
+import time
 import datetime
 
 # --- 2. CONFIGURAÇÃO DO APP ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if ENSURE_INDEXES:
+        await ensure_indexes(collections_by_name)
+    # índice de busca em memória: construído uma vez no startup
+    await rebuild_search_indexes()
+    tasks = [asyncio.create_task(watch_taco_version())]
+    if SEARCH_INDEX_REFRESH_SECONDS > 0:
+        tasks.append(asyncio.create_task(refresh_recipes_index_periodically()))
+    if INTAKE_WRITE_BEHIND:
+        tasks.append(asyncio.create_task(intake_writer.run()))
+    yield
+    for task in tasks:
+        task.cancel()
+    # nada pendente fica para trás no shutdown
+    await intake_writer.close()
+
 app = FastAPI(
     title="TACO table with MongoDB API",
     description="API to consult nutritional information from TACO table per gram",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # Permitir frontend Angular
@@ -29,10 +70,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+# Latência por rota e requisições em andamento (ver metrics.py e /metrics)
+app.add_middleware(MetricsMiddleware)
+
 load_dotenv()
 
+# Profiling opt-in por requisição (ver profiling.py); desligado, nada é instalado
+if os.getenv("PROFILING_ENABLED") == "1":
+    app.add_middleware(
+        ProfilingMiddleware,
+        output_dir=os.getenv("PROFILING_DIR", "profiles"),
+        token=os.getenv("PROFILING_TOKEN"),
+        sample_interval=float(os.getenv("PROFILING_SAMPLE_INTERVAL", "0.001"))
+    )
+
 # Configuração do MongoDB
 mongo_uri = os.getenv("MONGO_URI")
 db_name = os.getenv("DB_NAME")
@@ -42,8 +96,17 @@ collection_historical = os.getenv("COLLECTION_NAME2")
 collection_daily_log = os.getenv("COLLECTION_NAME3")
 collection_historical_log = os.getenv("COLLECTION_NAME4")
 collection_recipes = os.getenv("COLLECTION_NAME5")
+collection_meta = os.getenv("COLLECTION_NAME6", "catalog_meta")
+collection_rollups = os.getenv("COLLECTION_NAME7", "intake_rollups")
+collection_log_days = os.getenv("COLLECTION_NAME8", "food_log_days")
 
-client = motor.motor_asyncio.AsyncIOMotorClient(mongo_uri)
+# Armazenamento dos itens do diário alimentar: "items" (um documento por item em
+# daily_log/historical_log) ou "buckets" (um documento por usuário e dia, ver
+# log_buckets.py). Os totais em daily_intake/historical_intake e os rollups são
+# mantidos nos dois modos.
+FOOD_LOG_BUCKETS = os.getenv("FOOD_LOG_STORAGE", "items") == "buckets"
+
+client = motor.motor_asyncio.AsyncIOMotorClient(mongo_uri, event_listeners=[MongoCommandListener()])
 db = client[db_name]
 food_collection = db[collection_taco]
 daily_intake_collection = db[collection_daily]
@@ -51,15 +114,120 @@ historical_intake_collection = db[collection_historical]
 daily_log_intake_collection = db[collection_daily_log]
 historical_log_intake_collection = db[collection_historical_log]
 recipes_collection = db[collection_recipes]
+meta_collection = db[collection_meta]
+rollups_collection = db[collection_rollups]
+log_days_collection = db[collection_log_days]
+
+# nomes lógicos usados por indexes.py
+collections_by_name = {
+    "daily_intake": daily_intake_collection,
+    "historical_intake": historical_intake_collection,
+    "daily_log": daily_log_intake_collection,
+    "historical_log": historical_log_intake_collection,
+    "recipes": recipes_collection,
+    "rollups": rollups_collection,
+}
+if FOOD_LOG_BUCKETS:
+    collections_by_name["log_days"] = log_days_collection
+ENSURE_INDEXES = os.getenv("ENSURE_INDEXES", "1") == "1"
+
+# Índices de busca (ver search_index.py). Com vários workers, cada processo
+# tem o seu: as escritas de receitas atualizam o índice local e o refresh
+# periódico alinha os demais. A TACO só é recarregada quando o data_import.py
+# publica uma nova versão em meta_collection.
+SEARCH_INDEX_REFRESH_SECONDS = int(os.getenv("SEARCH_INDEX_REFRESH_SECONDS", "300"))
+TACO_VERSION_POLL_SECONDS = int(os.getenv("TACO_VERSION_POLL_SECONDS", "30"))
+taco_index = SearchIndex()
+recipes_index = SearchIndex()
+taco_version = None
+
+# Catálogo TACO em memória (ver catalog.py), trocado junto com o índice.
+# /taco_table responde com ETag (hash do conteúdo) e Cache-Control.
+taco_catalog = TacoCatalog()
+# Matriz de nutrientes por grama para /nutrition/compute (ver nutrition.py)
+taco_nutrients = NutrientMatrix()
+TACO_CACHE_MAX_AGE = int(os.getenv("TACO_CACHE_MAX_AGE", "3600"))
+TACO_BULK_MAX_IDS = 200
+
+# Autocomplete (/search/suggest, ver trie.py): um trie da TACO e um por
+# usuário para as receitas, atualizados junto com os índices de busca
+taco_suggest = PrefixTrie()
+recipe_suggest: dict[str, PrefixTrie] = {}
+SUGGEST_DEFAULT_LIMIT = 8
+SUGGEST_MAX_LIMIT = TOP_K
+
+# Cache de resultados por consulta normalizada (receitas também por usuário)
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "2048"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "300"))
+taco_search_cache = TTLCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+recipe_search_cache = TTLCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+
+# Leituras concorrentes com a mesma chave compartilham uma única ida ao Mongo
+# (ver singleflight.py). As chaves levam o nome do endpoint como prefixo.
+flight = SingleFlight()
+FUZZY_MAX_DISTANCE = 2
+# receitas do próprio usuário sobem na lista, sem superar um tipo de casamento
+# melhor (o espaço entre os níveis de score em search_index.py é 20)
+OWN_RECIPE_BOOST = 15
+SEARCH_MAX_LIMIT = 100
+
+# Estado interno exposto em /metrics, lido só na coleta
+registry.register(CallbackMetric(
+    "search_cache_events_total", "Acertos, faltas, remoções e invalidações do cache de busca.",
+    ("cache", "event"),
+    lambda: {
+        (name, event): cache.stats()[event]
+        for name, cache in (("taco", taco_search_cache), ("recipes", recipe_search_cache))
+        for event in ("hits", "misses", "evictions", "invalidations")
+    },
+    kind="counter"
+))
+registry.register(CallbackMetric(
+    "search_cache_entries", "Entradas no cache de busca.", ("cache",),
+    lambda: {("taco",): len(taco_search_cache), ("recipes",): len(recipe_search_cache)}
+))
+registry.register(CallbackMetric(
+    "search_index_documents", "Documentos nos índices de busca em memória.", ("index",),
+    lambda: {("taco",): len(taco_index), ("recipes",): len(recipes_index), ("taco_catalog",): len(taco_catalog),
+             ("taco_suggest",): len(taco_suggest),
+             ("recipe_suggest",): sum(len(trie) for trie in list(recipe_suggest.values()))}
+))
+registry.register(CallbackMetric(
+    "singleflight_calls_total", "Chamadas executadas e compartilhadas pelo singleflight.", ("result",),
+    lambda: {("executed",): flight.calls, ("shared",): flight.shared},
+    kind="counter"
+))
+
+# Listagens paginadas por cursor (ver pagination.py); o padrão mantém as 100
+# primeiras, como antes, e o header X-Next-Cursor aponta a próxima página
+LIST_PAGE_SIZE = 100
+LIST_MAX_PAGE_SIZE = 500
+
+# Write-behind dos totais de ingestão (ver write_behind.py). Com 0 (padrão), as
+# escritas do diário alimentar atualizam os totais antes de responder, como antes.
+INTAKE_WRITE_BEHIND_MS = int(os.getenv("INTAKE_WRITE_BEHIND_MS", "0"))
+INTAKE_WRITE_BEHIND = INTAKE_WRITE_BEHIND_MS > 0
+
+# /intake/stats (ver intake_stats.py): resultado guardado por (usuário,
+# intervalo, parâmetros, hash dos totais lidos). Os totais do intervalo são lidos
+# sempre (uma consulta pelo índice user_date); o cache poupa o cálculo. Qualquer
+# escrita nos totais, em qualquer worker, muda o hash e a próxima leitura recalcula.
+STATS_CACHE_SIZE = int(os.getenv("STATS_CACHE_SIZE", "512"))
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "3600"))
+STATS_DEFAULT_DAYS = 90
+STATS_MAX_DAYS = 731
+intake_stats_cache = TTLCache(STATS_CACHE_SIZE, STATS_CACHE_TTL)
+
+# Rollover (/cron/rollover): tamanho dos lotes e concorrência entre usuários
+ROLLOVER_CHUNK_SIZE = int(os.getenv("ROLLOVER_CHUNK_SIZE", "500"))
+ROLLOVER_CONCURRENCY = int(os.getenv("ROLLOVER_CONCURRENCY", "4"))
+ROLLOVER_USERS_PER_BATCH = int(os.getenv("ROLLOVER_USERS_PER_BATCH", "100"))
+# Reconciliação: tentativas por chave quando um $inc concorrente muda o total lido
+RECONCILE_ATTEMPTS = 3
 
 # --- 3. MODELOS PYDANTIC ---
 class NutritionalInfo(BaseModel):
-    model_config = ConfigDict(
-        populate_by_name=True,
-        json_encoders={
-            float: lambda v: float(f"{v:.4f}") if v is not None else None
-        }
-    )
+    model_config = ConfigDict(populate_by_name=True)
 
     id: int = Field(alias="_id")
     description: str
@@ -69,6 +237,17 @@ class NutritionalInfo(BaseModel):
     carbo_g: float | None = None
     date: str | None = None
 
+class NutritionalInfoBulk(BaseModel):
+    items: list[NutritionalInfo]
+    missing: list[int]
+
+class NutritionItem(BaseModel):
+    food_id: int
+    grams: float = Field(..., gt=0)
+
+class NutritionComputeRequest(BaseModel):
+    lists: list[list[NutritionItem]] = Field(..., min_length=1, max_length=500)
+
 class AddFoodRequest(BaseModel):
     user_id: str = Field(..., description="User ID")
     description: str = Field(..., description="Food/recipe description")
@@ -79,6 +258,9 @@ class AddFoodRequest(BaseModel):
     gordura: float = 0.0
     date: str | None = None
 
+class AddFoodBatchRequest(BaseModel):
+    items: list[AddFoodRequest] = Field(..., min_length=1, max_length=200)
+
 class AddIntakeRequest(BaseModel):
     user_id: str
     calorias: float
@@ -87,104 +269,460 @@ class AddIntakeRequest(BaseModel):
     gordura: float
 
 # --- 4. FUNÇÕES AUXILIARES ---
-def normalize_text(text: str) -> str:
-    text = unidecode(text).lower()
-    text = re.sub(r'[^a-z0-9\s]', ' ', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
-
-def levenshtein_distance(a: str, b: str) -> int:
-    if a == b:
-        return 0
-    if len(a) == 0:
-        return len(b)
-    if len(b) == 0:
-        return len(a)
-
-    previous_row = list(range(len(b) + 1))
-    for i, ca in enumerate(a, start=1):
-        current_row = [i]
-        for j, cb in enumerate(b, start=1):
-            insert_cost = previous_row[j] + 1
-            delete_cost = current_row[j - 1] + 1
-            replace_cost = previous_row[j - 1] + (ca != cb)
-            current_row.append(min(insert_cost, delete_cost, replace_cost))
-        previous_row = current_row
-    return previous_row[-1]
-
-def is_fuzzy_match(query: str, text: str, max_distance: int = 2) -> bool:
-    distance = levenshtein_distance(query, text[:len(query) + 2])
-    return distance <= max_distance
-
-async def search_in_taco_results(normalized_query: str):
-    cursor = food_collection.find({})
-    all_foods = await cursor.to_list(length=1000)
-    results = []
-
-    for food in all_foods:
-        description = food.get("description", "")
-        normalized_desc = normalize_text(description)
-
-        if normalized_query in normalized_desc or is_fuzzy_match(normalized_query, normalized_desc):
-            results.append({
-                "_id": str(food["_id"]),
-                "description": description,
-                "type": "taco",
-                "calorias_kcal": safe_float(food.get("calorias_kcal")),
-                "proteinas_g": safe_float(food.get("proteinas_g")),
-                "carbo_g": safe_float(food.get("carbo_g")),
-                "gordura_g": safe_float(food.get("gordura_g"))
-            })
-
-    return results
-
-async def search_in_recipes_results(normalized_query: str):
-    cursor = recipes_collection.find({})
-    all_recipes = await cursor.to_list(length=1000)
-    results = []
-
-    for recipe in all_recipes:
-        normalized_name = normalize_text(recipe["name"])
-        if normalized_query in normalized_name or is_fuzzy_match(normalized_query, normalized_name):
-            results.append({
-                "_id": str(recipe["_id"]),
-                "description": recipe["name"],
-                "type": "recipe",
-                "calorias_kcal": safe_float(recipe.get("calorias")),
-                "proteinas_g": safe_float(recipe.get("proteinas")),
-                "carbo_g": safe_float(recipe.get("carbo")),
-                "gordura_g": safe_float(recipe.get("gordura"))
-            })
-
-    return results
-
-async def update_daily_intake(user_id: str, date: str):
-    cursor = daily_log_intake_collection.find({"user_id": user_id, "date": date})
-    total = {"calorias": 0.0, "proteinas": 0.0, "carbo": 0.0, "gordura": 0.0}
-    async for item in cursor:
-        total["calorias"] += item.get("calorias") or 0.0
-        total["proteinas"] += item.get("proteinas") or 0.0
-        total["carbo"] += item.get("carbo") or 0.0
-        total["gordura"] += item.get("gordura") or 0.0
-    await daily_intake_collection.update_one(
-        {"user_id": user_id, "date": date},
-        {"$set": total},
-        upsert=True
+# Projeções dos endpoints de leitura: só os campos que a resposta devolve
+TACO_TABLE_PROJECTION = {"description": 1, "date": 1, **{field: 1 for field in NUTRIENT_FIELDS}}
+SEARCH_FIELDS_PROJECTION = {"search_text": 1, "search_tokens": 1}
+FOOD_LOG_PROJECTION = {"user_id": 1, "description": 1, "grams": 1, "date": 1,
+                       **{field: 1 for field in MACRO_FIELDS}}
+INTAKE_PROJECTION = {"_id": 0, "user_id": 1, "date": 1, **{field: 1 for field in MACRO_FIELDS}}
+INTAKE_STATS_PROJECTION = {"_id": 0, "date": 1, **{field: 1 for field in MACRO_FIELDS}}
+ROLLUP_PROJECTION = {"_id": 0, "user_id": 1, "granularity": 1, "period": 1, "start": 1,
+                     **{field: 1 for field in MACRO_FIELDS}}
+RECIPE_PROJECTION = {"user_id": 1, "name": 1, "ingredients": 1, "createdAt": 1,
+                     **{field: 1 for field in MACRO_FIELDS}}
+
+def taco_search_payload(food: dict) -> dict:
+    return {
+        "_id": str(food["_id"]),
+        "description": food.get("description", ""),
+        "type": "taco",
+        "calorias_kcal": safe_float(food.get("calorias_kcal")),
+        "proteinas_g": safe_float(food.get("proteinas_g")),
+        "carbo_g": safe_float(food.get("carbo_g")),
+        "gordura_g": safe_float(food.get("gordura_g"))
+    }
+
+def recipe_search_payload(recipe: dict) -> dict:
+    return {
+        "_id": str(recipe["_id"]),
+        "description": recipe.get("name", ""),
+        "type": "recipe",
+        "calorias_kcal": safe_float(recipe.get("calorias")),
+        "proteinas_g": safe_float(recipe.get("proteinas")),
+        "carbo_g": safe_float(recipe.get("carbo")),
+        "gordura_g": safe_float(recipe.get("gordura"))
+    }
+
+def suggestion_payload(payload: dict) -> dict:
+    return {"_id": payload["_id"], "label": payload["description"], "type": payload["type"]}
+
+# receitas salvas/apagadas enquanto um rebuild_recipes_index lê a coleção: o
+# cursor pode já ter passado por elas, então o rebuild as reaplica no índice
+# novo antes da troca. Um dicionário por rebuild em andamento:
+# id -> (receita, user_id), com receita None se foi apagada.
+recipe_rebuild_changes: list[dict] = []
+
+def index_recipe(recipe: dict, index: SearchIndex | None = None,
+                 suggest: dict[str, PrefixTrie] | None = None):
+    payload = recipe_search_payload(recipe)
+    normalized, tokens = stored_search_fields(recipe, "name")
+    user_id = recipe.get("user_id")
+    if index is None:
+        index = recipes_index
+        for changes in recipe_rebuild_changes:
+            changes[payload["_id"]] = (recipe, user_id)
+    if suggest is None:
+        suggest = recipe_suggest
+    index.add(payload["_id"], normalized, payload, owner=user_id, tokens=tokens)
+    if user_id:
+        suggest.setdefault(user_id, PrefixTrie()).add(payload["_id"], normalized, suggestion_payload(payload))
+
+def unindex_recipe(recipe_id: str, user_id: str | None, index: SearchIndex | None = None,
+                   suggest: dict[str, PrefixTrie] | None = None):
+    if index is None:
+        index = recipes_index
+        for changes in recipe_rebuild_changes:
+            changes[recipe_id] = (None, user_id)
+    if suggest is None:
+        suggest = recipe_suggest
+    index.remove(recipe_id)
+    trie = suggest.get(user_id)
+    if trie is not None:
+        trie.remove(recipe_id)
+        if not len(trie):
+            suggest.pop(user_id, None)
+
+def invalidate_recipe_search(*search_texts: str | None):
+    # só derruba as consultas que casariam com o nome antigo ou o novo
+    normalized_names = [text for text in search_texts if text]
+    recipe_search_cache.invalidate_where(
+        lambda key: any(could_match(key[0], name, FUZZY_MAX_DISTANCE) for name in normalized_names)
     )
 
-async def update_historical_intake(user_id: str, date: str):
-    cursor = daily_log_intake_collection.find({"user_id": user_id, "date": date})
-    total = {"calorias": 0.0, "proteinas": 0.0, "carbo": 0.0, "gordura": 0.0}
-    async for item in cursor:
-        total["calorias"] += item.get("calorias") or 0.0
-        total["proteinas"] += item.get("proteinas") or 0.0
-        total["carbo"] += item.get("carbo") or 0.0
-        total["gordura"] += item.get("gordura") or 0.0
-    await historical_intake_collection.update_one(
-        {"user_id": user_id, "date": date},
-        {"$set": total},
-        upsert=True
+async def get_taco_version():
+    meta = await meta_collection.find_one({"_id": "taco"}, {"version": 1})
+    return meta.get("version") if meta else None
+
+async def rebuild_taco_index():
+    global taco_index, taco_suggest, taco_catalog, taco_nutrients, taco_version
+
+    version = await get_taco_version()
+    foods = await food_collection.find({}, {**TACO_TABLE_PROJECTION, **SEARCH_FIELDS_PROJECTION}).to_list(length=None)
+    new_taco_index = SearchIndex()
+    new_taco_suggest = PrefixTrie()
+    for food in foods:
+        payload = taco_search_payload(food)
+        normalized, tokens = stored_search_fields(food, "description")
+        new_taco_index.add(payload["_id"], normalized, payload, tokens=tokens)
+        new_taco_suggest.add(payload["_id"], normalized, suggestion_payload(payload))
+    new_taco_catalog = TacoCatalog(foods)
+    new_taco_nutrients = NutrientMatrix(foods)
+
+    # troca atômica: buscas em andamento continuam usando o índice antigo
+    taco_index, taco_suggest, taco_catalog, taco_nutrients, taco_version = (
+        new_taco_index, new_taco_suggest, new_taco_catalog, new_taco_nutrients, version
     )
+    taco_search_cache.clear()
+
+async def rebuild_recipes_index():
+    global recipes_index, recipe_suggest
+
+    new_recipes_index = SearchIndex()
+    new_recipe_suggest = {}
+    changes = {}
+    recipe_rebuild_changes.append(changes)
+    try:
+        cursor = recipes_collection.find({}, {"user_id": 1, "name": 1, "calorias": 1, "proteinas": 1,
+                                              "carbo": 1, "gordura": 1, **SEARCH_FIELDS_PROJECTION})
+        async for recipe in cursor:
+            index_recipe(recipe, new_recipes_index, new_recipe_suggest)
+    finally:
+        recipe_rebuild_changes[:] = [other for other in recipe_rebuild_changes if other is not changes]
+
+    # sem await entre reaplicar e trocar: nenhuma escrita fica de fora
+    for recipe_id, (recipe, user_id) in changes.items():
+        if recipe is None:
+            unindex_recipe(recipe_id, user_id, new_recipes_index, new_recipe_suggest)
+        else:
+            index_recipe(recipe, new_recipes_index, new_recipe_suggest)
+    recipes_index, recipe_suggest = new_recipes_index, new_recipe_suggest
+    recipe_search_cache.clear()
+
+async def rebuild_search_indexes():
+    await rebuild_taco_index()
+    await rebuild_recipes_index()
+
+async def watch_taco_version():
+    while True:
+        await asyncio.sleep(TACO_VERSION_POLL_SECONDS)
+        try:
+            if await get_taco_version() != taco_version:
+                await rebuild_taco_index()
+        except Exception as e:
+            print(f"[ERROR] Falha ao recarregar a tabela TACO: {e}")
+
+async def refresh_recipes_index_periodically():
+    while True:
+        await asyncio.sleep(SEARCH_INDEX_REFRESH_SECONDS)
+        try:
+            await rebuild_recipes_index()
+        except Exception as e:
+            print(f"[ERROR] Falha ao reconstruir índice de receitas: {e}")
+
+def search_in_taco_results(normalized_query: str, limit: int):
+    return taco_index.search(normalized_query, limit, FUZZY_MAX_DISTANCE)
+
+def search_in_recipes_results(normalized_query: str, limit: int, user_id: str | None = None):
+    return recipes_index.search(normalized_query, limit, FUZZY_MAX_DISTANCE,
+                                owner=user_id, owner_boost=OWN_RECIPE_BOOST)
+
+def rank_results(scored: list, limit: int, offset: int = 0) -> list[dict]:
+    # seleção top-k com heap: O(n log k) em vez de ordenar tudo
+    top = heapq.nsmallest(offset + limit, scored, key=rank_key)
+    return [payload for _, _, payload in top[offset:]]
+
+def macro_values(item: dict, sign: float = 1.0) -> dict:
+    return {field: sign * safe_float(item.get(field)) for field in MACRO_FIELDS}
+
+def macro_delta(old: dict, new: dict) -> dict:
+    return {field: safe_float(new.get(field)) - safe_float(old.get(field)) for field in MACRO_FIELDS}
+
+def rollup_periods(date: str) -> list[tuple[str, str, str]]:
+    """(granularity, período, primeiro dia) da semana ISO e do mês de `date`."""
+    try:
+        day = datetime.date.fromisoformat(date)
+    except (TypeError, ValueError):
+        return []
+    year, week, _ = day.isocalendar()
+    monday = day - datetime.timedelta(days=day.weekday())
+    return [
+        ("week", f"{year}-W{week:02d}", monday.isoformat()),
+        ("month", day.strftime("%Y-%m"), day.replace(day=1).isoformat())
+    ]
+
+def rollup_operations(deltas: dict[tuple[str, str], dict]) -> list[UpdateOne]:
+    combined = {}
+    for (user_id, date), delta in deltas.items():
+        for granularity, period, start in rollup_periods(date):
+            total = combined.setdefault((user_id, granularity, period, start), dict.fromkeys(MACRO_FIELDS, 0.0))
+            for field in MACRO_FIELDS:
+                total[field] += delta[field]
+    return [
+        UpdateOne({"user_id": user_id, "granularity": granularity, "period": period},
+                  {"$inc": total, "$set": {"start": start}}, upsert=True)
+        for (user_id, granularity, period, start), total in combined.items()
+    ]
+
+async def apply_intake_delta(user_id: str, date: str, delta: dict):
+    # totais mantidos por $inc: O(1) por escrita, sem reler os itens do dia
+    await apply_intake_deltas({(user_id, date): delta})
+
+async def apply_intake_deltas(deltas: dict[tuple[str, str], dict]):
+    # um bulk_write por coleção para qualquer número de (user_id, date),
+    # incluindo os rollups semanais/mensais do histórico
+    deltas = {key: delta for key, delta in deltas.items() if any(delta.values())}
+    if not deltas:
+        return
+    operations = [
+        UpdateOne({"user_id": user_id, "date": date}, {"$inc": delta}, upsert=True)
+        for (user_id, date), delta in deltas.items()
+    ]
+    writes = [
+        daily_intake_collection.bulk_write(operations, ordered=False),
+        historical_intake_collection.bulk_write(operations, ordered=False)
+    ]
+    rollups = rollup_operations(deltas)
+    if rollups:
+        writes.append(rollups_collection.bulk_write(rollups, ordered=False))
+    await asyncio.gather(*writes)
+
+async def repair_intake_totals(keys: list[tuple[str, str]]):
+    # lote do write-behind que falhou no meio: os totais dos dias voltam a ser
+    # a soma dos itens e os rollups dos usuários são refeitos desses totais
+    result = await reconcile_intake_totals({"$or": [{"user_id": user_id, "date": date} for user_id, date in keys]})
+    if result["unresolved"]:
+        # escritas concorrentes nos mesmos dias: o write-behind tenta de novo
+        raise RuntimeError(f"{result['unresolved']} dias ainda em escrita")
+    await rebuild_intake_rollups({"user_id": {"$in": sorted({user_id for user_id, _ in keys})}})
+
+intake_writer = WriteBehind(apply_intake_deltas, repair_intake_totals, INTAKE_WRITE_BEHIND_MS / 1000)
+registry.register(CallbackMetric(
+    "intake_write_behind_days", "Dias com totais pendentes no write-behind.", (),
+    lambda: {(): len(intake_writer)}
+))
+registry.register(CallbackMetric(
+    "intake_write_behind_total", "Deltas recebidos e dias gravados pelo write-behind.", ("event",),
+    lambda: {("queued",): intake_writer.queued, ("flushed",): intake_writer.flushed,
+             ("flushes",): intake_writer.flushes, ("failures",): intake_writer.failures,
+             ("repaired",): intake_writer.repaired},
+    kind="counter"
+))
+
+# dias com item já gravado (ou sendo gravado) cujo delta ainda não foi aplicado
+# nem enfileirado no write-behind; a reconciliação deixa esses dias para depois
+intake_writes_inflight = Counter()
+
+@contextmanager
+def intake_writes(keys):
+    keys = list(keys)
+    intake_writes_inflight.update(keys)
+    try:
+        yield
+    finally:
+        intake_writes_inflight.subtract(keys)
+        for key in keys:
+            if intake_writes_inflight[key] <= 0:
+                del intake_writes_inflight[key]
+
+def intake_write_pending(key: tuple[str, str]) -> bool:
+    return intake_writes_inflight[key] > 0 or intake_writer.is_pending(key)
+
+async def record_intake_delta(user_id: str, date: str, delta: dict):
+    await record_intake_deltas({(user_id, date): delta})
+
+async def record_intake_deltas(deltas: dict[tuple[str, str], dict]):
+    # escritas do diário alimentar: com write-behind só enfileiram
+    if INTAKE_WRITE_BEHIND:
+        intake_writer.add(deltas)
+    else:
+        await apply_intake_deltas(deltas)
+
+async def flush_intake(user_id: str):
+    # leitura das próprias escritas antes de ler totais do usuário
+    if INTAKE_WRITE_BEHIND and intake_writer.has_pending(user_id):
+        try:
+            await intake_writer.flush(user_id)
+            await intake_writer.repair(user_id)
+        except Exception as e:
+            # o worker tenta de novo; a leitura segue com os totais gravados até aqui
+            print(f"[WARN] Falha ao gravar totais pendentes de {user_id}: {e}")
+
+async def rebuild_intake_rollups(match: dict) -> int:
+    # recalcula os rollups a partir dos totais diários (backfill / correção)
+    await intake_writer.flush()
+    totals = {}
+    projection = {"user_id": 1, "date": 1, **{field: 1 for field in MACRO_FIELDS}}
+    async for day in historical_intake_collection.find(match, projection):
+        for granularity, period, start in rollup_periods(day["date"]):
+            total = totals.setdefault((day["user_id"], granularity, period, start), dict.fromkeys(MACRO_FIELDS, 0.0))
+            for field in MACRO_FIELDS:
+                total[field] += safe_float(day.get(field))
+    operations = [
+        UpdateOne({"user_id": user_id, "granularity": granularity, "period": period},
+                  {"$set": {"start": start, **total}}, upsert=True)
+        for (user_id, granularity, period, start), total in totals.items()
+    ]
+    if operations:
+        await rollups_collection.bulk_write(operations, ordered=False)
+    return len(operations)
+
+async def reconcile_intake_totals(match: dict, attempts: int = RECONCILE_ATTEMPTS) -> dict:
+    """
+    Recalcula do zero os totais das chaves (user_id, date) que casam com `match`
+    a partir dos itens registrados e corrige os que divergirem (drift dos $inc).
+    Os itens vêm do histórico e do diário (o diário vence se o mesmo _id estiver
+    nos dois), já que o rollover move os itens de um para o outro; no modo
+    buckets, dos baldes de cada dia.
+
+    Os totais são lidos antes dos itens e cada correção só vale se o total
+    ainda estiver como foi lido: um $inc que chegue no meio (ex.: hoje, com
+    gente registrando) faz a correção não casar, e a chave é refeita do zero.
+    """
+    # pendências do write-behind aplicadas depois contariam em dobro
+    await intake_writer.flush()
+    projection = {"user_id": 1, "date": 1, **{field: 1 for field in MACRO_FIELDS}}
+    targets = (("daily", daily_intake_collection), ("historical", historical_intake_collection))
+    stored_totals = {name: await collection.find(match, projection).to_list(length=None)
+                     for name, collection in targets}
+
+    items = {}
+    if FOOD_LOG_BUCKETS:
+        async for item in log_buckets.iter_items(log_days_collection, match):
+            items[item["_id"]] = item
+    else:
+        # diário antes do histórico: o rollover grava no histórico e só depois
+        # apaga do diário, então um item movido no meio aparece em pelo menos uma
+        # das leituras (na ordem inversa, poderia faltar nas duas)
+        async for item in daily_log_intake_collection.find(match, projection):
+            items[item["_id"]] = item
+        async for item in historical_log_intake_collection.find(match, projection):
+            items.setdefault(item["_id"], item)
+
+    expected = {}
+    for item in items.values():
+        total = expected.setdefault((item["user_id"], item["date"]), dict.fromkeys(MACRO_FIELDS, 0.0))
+        for field in MACRO_FIELDS:
+            total[field] += safe_float(item.get(field))
+
+    repaired = {}
+    retry = set()
+    # correções no histórico também movem os rollups, pela diferença
+    rollup_deltas = {}
+    for name, collection in targets:
+        # (chave, filtro, update, upsert, diferença para os rollups)
+        repairs = []
+        seen = set()
+        for stored in stored_totals[name]:
+            key = (stored["user_id"], stored["date"])
+            seen.add(key)
+            # chave sem itens (todos apagados) deve voltar a zero
+            total = expected.get(key, dict.fromkeys(MACRO_FIELDS, 0.0))
+            if any(abs(safe_float(stored.get(field)) - total[field]) > 1e-6 for field in MACRO_FIELDS):
+                guard = {"_id": stored["_id"], **{field: stored.get(field) for field in MACRO_FIELDS}}
+                repairs.append((key, guard, {"$set": total}, False, macro_delta(stored, total)))
+        for (user_id, date), total in expected.items():
+            if (user_id, date) not in seen:
+                # dia que ainda não tinha total: só cria se continuar sem
+                repairs.append(((user_id, date), {"user_id": user_id, "date": date},
+                                {"$setOnInsert": total}, True, dict(total)))
+        # dia com delta ainda não gravado (escrita em andamento ou no buffer do
+        # write-behind): o item já está na soma e o $inc ainda vai chegar, então
+        # fica para a próxima tentativa
+        waiting = {repair[0] for repair in repairs if intake_write_pending(repair[0])}
+        retry |= waiting
+        repairs = [repair for repair in repairs if repair[0] not in waiting]
+
+        results = await asyncio.gather(*(
+            collection.update_one(query, update, upsert=upsert) for _, query, update, upsert, _ in repairs
+        ))
+        applied = 0
+        for (key, _, _, upsert, delta), result in zip(repairs, results):
+            if (result.upserted_id is not None) if upsert else result.matched_count == 1:
+                applied += 1
+                if name == "historical":
+                    rollup_deltas[key] = delta
+            else:
+                retry.add(key)
+        repaired[name] = applied
+
+    rollups = rollup_operations(rollup_deltas)
+    if rollups:
+        await rollups_collection.bulk_write(rollups, ordered=False)
+
+    unresolved = len(retry)
+    if retry and attempts > 1:
+        again = await reconcile_intake_totals(
+            {"$or": [{"user_id": user_id, "date": date} for user_id, date in sorted(retry)]}, attempts - 1
+        )
+        for name, count in again["repaired"].items():
+            repaired[name] += count
+        unresolved = again["unresolved"]
+
+    return {"checked": len(expected), "repaired": repaired, "unresolved": unresolved}
+
+def catalog_headers(catalog: TacoCatalog) -> dict:
+    return {"ETag": catalog.etag, "Cache-Control": f"public, max-age={TACO_CACHE_MAX_AGE}"}
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+def parse_ids(ids: str) -> list[int]:
+    try:
+        parsed = [int(value) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    parsed = list(dict.fromkeys(parsed))
+    if not parsed:
+        raise HTTPException(status_code=400, detail="ids is required")
+    if len(parsed) > TACO_BULK_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {TACO_BULK_MAX_IDS} ids per request")
+    return parsed
+
+def recipe_macros(ingredients) -> dict | None:
+    """Macros por 100 g da receita, calculados a partir dos ingredientes."""
+    taco_items = []
+    others = dict.fromkeys(MACRO_FIELDS, 0.0)
+    total_grams = 0.0
+    for ingredient in ingredients or []:
+        if not isinstance(ingredient, dict):
+            continue
+        grams = safe_float(ingredient.get("grams"))
+        if grams <= 0:
+            continue
+        total_grams += grams
+        food = ingredient.get("food") or {}
+        food_id = food.get("_id", ingredient.get("food_id"))
+        # a busca devolve o _id da TACO como string
+        if isinstance(food_id, str) and food_id.isdigit():
+            food_id = int(food_id)
+        if food.get("type", "taco") == "taco" and isinstance(food_id, int) and food_id in taco_nutrients:
+            taco_items.append((food_id, grams))
+        else:
+            # receita usada como ingrediente: fica com o valor enviado pelo cliente
+            for field in MACRO_FIELDS:
+                others[field] += safe_float(ingredient.get(field))
+    if total_grams <= 0:
+        return None
+
+    totals, _, _ = taco_nutrients.compute([taco_items])
+    factor = 100 / total_grams
+    return {field: (float(totals[0, column]) + others[field]) * factor
+            for column, field in enumerate(MACRO_FIELDS)}
+
+def page_cursor(cursor: str | None) -> tuple[str | None, ObjectId | None]:
+    if not cursor:
+        return None, None
+    try:
+        return decode_cursor(cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def page_response(items: list[dict], next_cursor: str | None) -> FastJSONResponse:
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return FastJSONResponse(items, headers=headers)
 
 def safe_float(value, default: float = 0.0) -> float:
     if value is None:
@@ -198,102 +736,235 @@ def safe_float(value, default: float = 0.0) -> float:
 # --- 5. ENDPOINTS FUNCIONAIS ---
 
 @app.get("/search/combined")
-async def search_combined(q: str = Query(..., min_length=2)):
+async def search_combined(
+    q: str = Query(..., min_length=2),
+    user_id: str | None = None,
+    limit: int = Query(20, ge=1, le=SEARCH_MAX_LIMIT),
+    offset: int = Query(0, ge=0)
+):
     normalized_query = normalize_text(q.strip())
-    taco_task = asyncio.create_task(search_in_taco_results(normalized_query))
-    recipes_task = asyncio.create_task(search_in_recipes_results(normalized_query))
-    taco_results, recipe_results = await asyncio.gather(taco_task, recipes_task)
-    results = taco_results + recipe_results
+    window = offset + limit
+
+    taco_key = (normalized_query, window)
+    taco_scored = taco_search_cache.get(taco_key)
+    if taco_scored is None:
+        taco_scored = search_in_taco_results(normalized_query, window)
+        taco_search_cache.set(taco_key, taco_scored)
 
-    if not results:
+    recipe_key = (normalized_query, window, user_id)
+    recipe_scored = recipe_search_cache.get(recipe_key)
+    if recipe_scored is None:
+        recipe_scored = search_in_recipes_results(normalized_query, window, user_id)
+        recipe_search_cache.set(recipe_key, recipe_scored)
+
+    scored = taco_scored + recipe_scored
+
+    if not scored:
         raise HTTPException(status_code=404, detail=f"Nenhum alimento ou prato encontrado para '{q}'")
 
-    try:
-        results.sort(key=lambda x: not normalize_text(x["description"]).startswith(normalized_query))
-    except Exception as e:
-        print(f"[ERROR] Falha ao ordenar: {e}")
+    return FastJSONResponse(rank_results(scored, limit, offset))
+
+@app.get("/search/suggest")
+async def search_suggest(
+    q: str = Query(..., min_length=1),
+    user_id: str | None = None,
+    limit: int = Query(SUGGEST_DEFAULT_LIMIT, ge=1, le=SUGGEST_MAX_LIMIT)
+):
+    # só ids e rótulos; sem casamento devolve lista vazia (não 404)
+    prefix = normalize_text(q)
+    if not prefix:
+        return FastJSONResponse([])
+    suggestions = taco_suggest.lookup(prefix, limit)
+    user_trie = recipe_suggest.get(user_id) if user_id else None
+    if user_trie is not None:
+        # receitas do usuário vêm antes da TACO em caso de empate
+        suggestions = heapq.merge(user_trie.lookup(prefix, limit), suggestions, key=lambda s: s[0])
+    return FastJSONResponse([payload for _, payload in itertools.islice(suggestions, limit)])
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/search/cache/stats")
+async def search_cache_stats():
+    return {
+        "taco": taco_search_cache.stats(),
+        "recipes": recipe_search_cache.stats(),
+        "singleflight": flight.stats()
+    }
 
-    return results
+@app.get("/taco_table", response_model=NutritionalInfoBulk)
+async def search_by_codes(
+    ids: str = Query(..., description="Códigos separados por vírgula"),
+    if_none_match: str | None = Header(None)
+):
+    catalog = taco_catalog
+    food_ids = parse_ids(ids)
+    found = {food_id: catalog.get_json(food_id) for food_id in food_ids}
+    missing = [food_id for food_id, body in found.items() if body is None]
+
+    headers = {}
+    if missing:
+        # importação recente ainda não recarregada neste processo: completa
+        # pelo Mongo e responde sem cache, já que o catálogo não cobre tudo
+        cursor = food_collection.find({"_id": {"$in": missing}}, TACO_TABLE_PROJECTION)
+        async for food in cursor:
+            found[food["_id"]] = dumps(food_payload(food))
+        missing = [food_id for food_id in missing if found[food_id] is None]
+    else:
+        headers = catalog_headers(catalog)
+        if etag_matches(if_none_match, catalog.etag):
+            return Response(status_code=304, headers=headers)
+
+    items = b",".join(body for body in found.values() if body is not None)
+    content = b'{"items":[' + items + b'],"missing":' + dumps(missing) + b"}"
+    return Response(content, media_type="application/json", headers=headers)
 
 @app.get("/taco_table/{food_id}", response_model=NutritionalInfo)
-async def search_by_code(food_id: int):
-    food = await food_collection.find_one({"_id": food_id})
-    if food:
-        return food
-    else:
-        raise HTTPException(status_code=404, detail=f"Food with code '{food_id}' not found.")
+async def search_by_code(food_id: int, if_none_match: str | None = Header(None)):
+    catalog = taco_catalog
+    body = catalog.get_json(food_id)
+    if body is None:
+        food = await flight.do(("taco_table", food_id),
+                               lambda: food_collection.find_one({"_id": food_id}, TACO_TABLE_PROJECTION))
+        if not food:
+            raise HTTPException(status_code=404, detail=f"Food with code '{food_id}' not found.")
+        return FastJSONResponse(food_payload(food))
+
+    headers = catalog_headers(catalog)
+    if etag_matches(if_none_match, catalog.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+@app.post("/nutrition/compute")
+async def compute_nutrition(request: NutritionComputeRequest):
+    # todas as listas num único passo vetorizado sobre a matriz por grama
+    totals, grams, missing = taco_nutrients.compute(
+        [[(item.food_id, item.grams) for item in items] for items in request.lists]
+    )
+    results = [
+        {"grams": total_grams, **dict(zip(MACRO_FIELDS, macros)), "missing": missing_ids}
+        for macros, total_grams, missing_ids in zip(totals.tolist(), grams.tolist(), missing)
+    ]
+    return FastJSONResponse({"results": results})
 
 @app.get("/intake/today")
 async def get_today_intake(user_id: str, date: str | None = None):
     today = date or datetime.datetime.now().strftime("%Y-%m-%d")
-    intake = await daily_intake_collection.find_one({"user_id": user_id, "date": today})
+    await flush_intake(user_id)
+    intake = await daily_intake_collection.find_one({"user_id": user_id, "date": today}, INTAKE_PROJECTION)
     if not intake:
         return {"calorias": 0, "proteinas": 0, "carbo": 0, "gordura": 0, "date": today}
-    intake.pop("_id", None)
-    return intake
+    return FastJSONResponse(intake)
 
 @app.post("/intake/add")
 async def add_intake(request: AddIntakeRequest):
     today = datetime.datetime.now().strftime("%Y-%m-%d")
-    await daily_intake_collection.update_one(
-        {"user_id": request.user_id, "date": today},
-        {"$inc": {
-            "calorias": request.calorias,
-            "proteinas": request.proteinas,
-            "carbo": request.carbo,
-            "gordura": request.gordura
-        }},
-        upsert=True
-    )
-    await update_historical_intake(request.user_id, today)
+    await apply_intake_delta(request.user_id, today, macro_values(request.model_dump()))
     return {"message": "Intake updated successfully"}
 
 @app.get("/food/daily")
-async def get_daily_food(user_id: str, date: str | None = None):
+async def get_daily_food(
+    user_id: str,
+    date: str | None = None,
+    limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_MAX_PAGE_SIZE),
+    cursor: str | None = None
+):
     today = date or datetime.datetime.now().strftime("%Y-%m-%d")
-    cursor = daily_log_intake_collection.find({"user_id": user_id, "date": today})
-    foods = await cursor.to_list(length=100)
-    for food in foods:
-        food["_id"] = str(food["_id"])
-    return foods
-
-@app.post("/food/add")
-async def add_food(food: AddFoodRequest):
-    user_id = food.user_id
-    if not user_id:
-        raise HTTPException(status_code=400, detail="User ID is required")
-
-    date = food.date or datetime.datetime.now().strftime("%Y-%m-%d")
-
-    doc_id = ObjectId()
-    doc = {
-        "_id": doc_id,
-        "user_id": user_id,
+    _, after = page_cursor(cursor)
+    if FOOD_LOG_BUCKETS:
+        foods, next_cursor = await bucket_page(user_id, today, limit, after)
+    else:
+        foods, next_cursor = await fetch_page(daily_log_intake_collection, {"user_id": user_id, "date": today},
+                                              FOOD_LOG_PROJECTION, limit, after)
+    return page_response(foods, next_cursor)
+
+async def bucket_page(user_id: str, date: str, limit: int, after: ObjectId | None):
+    # o dia inteiro vem numa leitura só; a página é recortada em memória
+    items = await log_buckets.day_items(log_days_collection, user_id, date)
+    foods, next_cursor = slice_page(items, limit, after, "buckets")
+    return [{field: food[field] for field in ("_id", *FOOD_LOG_PROJECTION) if field in food}
+            for food in foods], next_cursor
+
+def food_log_doc(food: AddFoodRequest) -> dict:
+    return {
+        "_id": ObjectId(),
+        "user_id": food.user_id,
         "description": food.description,
         "grams": float(food.grams),
         "calorias": float(food.calorias or 0.0),
         "proteinas": float(food.proteinas or 0.0),
         "carbo": float(food.carbo or 0.0),
         "gordura": float(food.gordura or 0.0),
-        "date": date,
+        "date": food.date or datetime.datetime.now().strftime("%Y-%m-%d"),
     }
 
-    # 1) salva no diário
-    await daily_log_intake_collection.insert_one(doc)
-
-    # 2) salva no histórico também (upsert pra não duplicar)
-    await historical_log_intake_collection.update_one(
-        {"_id": doc_id},
-        {"$set": doc},
-        upsert=True
-    )
+@app.post("/food/add")
+async def add_food(food: AddFoodRequest):
+    if not food.user_id:
+        raise HTTPException(status_code=400, detail="User ID is required")
 
-    # 3) recalcula agregados
-    await update_daily_intake(user_id, date)
-    await update_historical_intake(user_id, date)
+    doc = food_log_doc(food)
+    doc_id, user_id, date = doc["_id"], doc["user_id"], doc["date"]
+
+    with intake_writes([(user_id, date)]):
+        if FOOD_LOG_BUCKETS:
+            await asyncio.gather(
+                log_buckets.add_items(log_days_collection, [doc]),
+                record_intake_delta(user_id, date, macro_values(doc))
+            )
+            return {"msg": "Food added"}
+
+        # 1) salva no diário
+        await daily_log_intake_collection.insert_one(doc)
+
+        # 2) salva no histórico também (upsert pra não duplicar)
+        # 3) soma o item aos totais do dia
+        await asyncio.gather(
+            historical_log_intake_collection.update_one(
+                {"_id": doc_id},
+                {"$set": doc},
+                upsert=True
+            ),
+            record_intake_delta(user_id, date, macro_values(doc))
+        )
 
     return {"msg": "Food added"}
 
+@app.post("/food/add/batch")
+async def add_food_batch(batch: AddFoodBatchRequest):
+    if any(not food.user_id for food in batch.items):
+        raise HTTPException(status_code=400, detail="User ID is required")
+
+    docs = [food_log_doc(food) for food in batch.items]
+
+    # totais somados por (user_id, date): um $inc por dia tocado, não por item
+    deltas = {}
+    for doc in docs:
+        delta = deltas.setdefault((doc["user_id"], doc["date"]), dict.fromkeys(MACRO_FIELDS, 0.0))
+        for field in MACRO_FIELDS:
+            delta[field] += doc[field]
+
+    with intake_writes(deltas):
+        if FOOD_LOG_BUCKETS:
+            # um update por balde ($push $each + $inc), não por item
+            await asyncio.gather(
+                log_buckets.add_items(log_days_collection, docs),
+                record_intake_deltas(deltas)
+            )
+            return {"msg": "Foods added", "inserted_ids": [str(doc["_id"]) for doc in docs]}
+
+        await daily_log_intake_collection.insert_many(docs)
+        await asyncio.gather(
+            historical_log_intake_collection.bulk_write(
+                [UpdateOne({"_id": doc["_id"]}, {"$set": doc}, upsert=True) for doc in docs],
+                ordered=False
+            ),
+            record_intake_deltas(deltas)
+        )
+
+    return {"msg": "Foods added", "inserted_ids": [str(doc["_id"]) for doc in docs]}
+
 
 @app.put("/food/update/{food_id}")
 async def update_food(food_id: str, updates: dict):
@@ -307,19 +978,37 @@ async def update_food(food_id: str, updates: dict):
     if "grams" in updates and (updates["grams"] <= 0):
         raise HTTPException(status_code=400, detail="Grams must be greater than 0")
 
-    result = await daily_log_intake_collection.update_one(
-        {"_id": ObjectId(food_id)},
-        {"$set": updates}
-    )
+    if FOOD_LOG_BUCKETS:
+        try:
+            changed = await log_buckets.update_item(log_days_collection, ObjectId(food_id), updates)
+        except log_buckets.ConcurrentUpdateError:
+            raise HTTPException(status_code=409, detail="Food changed concurrently, try again")
+        if changed is None:
+            raise HTTPException(status_code=404, detail="Food not found")
+        old, new = changed
+        tasks = []
+    else:
+        # devolve o documento anterior para calcular a diferença nos totais
+        old = await daily_log_intake_collection.find_one_and_update(
+            {"_id": ObjectId(food_id)},
+            {"$set": updates},
+            return_document=ReturnDocument.BEFORE
+        )
 
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Food not found")
+        if old is None:
+            raise HTTPException(status_code=404, detail="Food not found")
 
-    # ✅ Recalcula histórico E diário
-    food = await daily_log_intake_collection.find_one({"_id": ObjectId(food_id)})
-    if food:
-        await update_daily_intake(food["user_id"], food["date"])  # <— ADICIONE ESTA LINHA
-        await update_historical_intake(food["user_id"], food["date"])
+        new = {**old, **updates}
+        tasks = [historical_log_intake_collection.update_one({"_id": old["_id"]}, {"$set": updates})]
+    if (old["user_id"], old["date"]) == (new["user_id"], new["date"]):
+        tasks.append(record_intake_delta(old["user_id"], old["date"], macro_delta(old, new)))
+    else:
+        # item mudou de dia: sai dos totais antigos e entra nos novos
+        tasks.append(record_intake_delta(old["user_id"], old["date"], macro_values(old, -1.0)))
+        tasks.append(record_intake_delta(new["user_id"], new["date"], macro_values(new)))
+    # o dia só é conhecido depois de gravar o item: marca antes do próximo await
+    with intake_writes({(old["user_id"], old["date"]), (new["user_id"], new["date"])}):
+        await asyncio.gather(*tasks)
 
     return {"msg": "Updated"}
 
@@ -327,77 +1016,150 @@ async def update_food(food_id: str, updates: dict):
 async def delete_food(food_id: str):
     if not ObjectId.is_valid(food_id):
         raise HTTPException(status_code=400, detail="Invalid ID format")
-    food = await daily_log_intake_collection.find_one({"_id": ObjectId(food_id)})
+    if FOOD_LOG_BUCKETS:
+        try:
+            food = await log_buckets.delete_item(log_days_collection, ObjectId(food_id))
+        except log_buckets.ConcurrentUpdateError:
+            raise HTTPException(status_code=409, detail="Food changed concurrently, try again")
+        if not food:
+            raise HTTPException(status_code=404, detail="Food not found")
+        with intake_writes([(food["user_id"], food["date"])]):
+            await record_intake_delta(food["user_id"], food["date"], macro_values(food, -1.0))
+        return {"msg": "Deleted and totals recalculated"}
+
+    food = await daily_log_intake_collection.find_one_and_delete({"_id": ObjectId(food_id)})
     if not food:
         raise HTTPException(status_code=404, detail="Food not found")
-    user_id = food["user_id"]
-    today = food["date"]
-    await daily_log_intake_collection.delete_one({"_id": ObjectId(food_id)})
-    cursor = daily_log_intake_collection.find({"user_id": user_id, "date": today})
-    total = {"calorias": 0, "proteinas": 0, "carbo": 0, "gordura": 0}
-    async for item in cursor:
-        total["calorias"] += item["calorias"]
-        total["proteinas"] += item["proteinas"]
-        total["carbo"] += item["carbo"]
-        total["gordura"] += item["gordura"]
-    await daily_intake_collection.update_one(
-        {"user_id": user_id, "date": today},
-        {"$set": total},
-        upsert=True
-    )
-    await update_historical_intake(user_id, today)
+    with intake_writes([(food["user_id"], food["date"])]):
+        await asyncio.gather(
+            historical_log_intake_collection.delete_one({"_id": food["_id"]}),
+            record_intake_delta(food["user_id"], food["date"], macro_values(food, -1.0))
+        )
     return {"msg": "Deleted and totals recalculated"}
 
 @app.get("/intake/history")
-async def get_history(user_id: str, days: int = 7):
-    cutoff_date = (datetime.datetime.now() - datetime.timedelta(days=days)).strftime("%Y-%m-%d")
-    cursor = historical_intake_collection.find({
-        "user_id": user_id,
-        "date": {"$gte": cutoff_date}
-    }).sort("date", 1).limit(days)
-    history = await cursor.to_list(length=days)
-    for item in history:
-        item.pop("_id", None)
-    return history
+async def get_history(
+    user_id: str,
+    days: int = 7,
+    granularity: Literal["day", "week", "month"] = "day",
+    from_date: str | None = Query(None, alias="from"),
+    to_date: str | None = Query(None, alias="to")
+):
+    try:
+        for value in (from_date, to_date):
+            if value:
+                datetime.datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format")
+
+    # sem intervalo explícito: últimos `days` dias, como antes
+    start = from_date or (datetime.datetime.now() - datetime.timedelta(days=days)).strftime("%Y-%m-%d")
+    ranged = from_date is not None or to_date is not None
+    await flush_intake(user_id)
+
+    if granularity == "day":
+        query = {"user_id": user_id, "date": {"$gte": start}}
+        if to_date:
+            query["date"]["$lte"] = to_date
+        cursor = historical_intake_collection.find(query, INTAKE_PROJECTION).sort("date", 1)
+        if not ranged:
+            cursor = cursor.limit(days)
+        return FastJSONResponse(await cursor.to_list(length=None))
+
+    # semana/mês: lê os rollups; os limites do intervalo caem no período
+    # (semana ISO ou mês) que os contém
+    start = rollup_periods(start)[0 if granularity == "week" else 1][2]
+    query = {"user_id": user_id, "granularity": granularity, "start": {"$gte": start}}
+    if to_date:
+        query["start"]["$lte"] = to_date
+    cursor = rollups_collection.find(query, ROLLUP_PROJECTION).sort("start", 1)
+    return FastJSONResponse(await cursor.to_list(length=None))
+
+
+@app.get("/intake/stats")
+async def get_intake_stats(
+    user_id: str,
+    from_date: str | None = Query(None, alias="from"),
+    to_date: str | None = Query(None, alias="to"),
+    window: int = Query(7, ge=1, le=90),
+    goal_calorias: float | None = Query(None, gt=0),
+    goal_proteinas: float | None = Query(None, gt=0),
+    goal_carbo: float | None = Query(None, gt=0),
+    goal_gordura: float | None = Query(None, gt=0),
+    tolerance: float = Query(0.1, ge=0, le=1)
+):
+    try:
+        end = datetime.date.fromisoformat(to_date) if to_date else datetime.date.today()
+        start = (datetime.date.fromisoformat(from_date) if from_date
+                 else end - datetime.timedelta(days=STATS_DEFAULT_DAYS - 1))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format")
+    if start > end or (end - start).days + 1 > STATS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range must be between 1 and {STATS_MAX_DAYS} days")
+
+    goals = {field: goal for field, goal in zip(MACRO_FIELDS, (goal_calorias, goal_proteinas, goal_carbo, goal_gordura))
+             if goal is not None}
+    await flush_intake(user_id)
+    days = await historical_intake_collection.find(
+        {"user_id": user_id, "date": {"$gte": start.isoformat(), "$lte": end.isoformat()}},
+        INTAKE_STATS_PROJECTION
+    ).sort("date", 1).to_list(length=None)
+    # a chave inclui os próprios totais lidos: não há versão para invalidar
+    digest = hashlib.sha1(dumps(days)).hexdigest()
+    key = (user_id, start, end, window, tuple(goals.items()), tolerance, digest)
+    stats = intake_stats_cache.get(key)
+    if stats is None:
+        stats = compute_stats(days, start, end, window, goals, tolerance)
+        intake_stats_cache.set(key, stats)
+    return FastJSONResponse(stats)
 
 
 @app.get("/food/history/{date}")
-async def get_historical_food(user_id: str, date: str):
+async def get_historical_food(
+    user_id: str,
+    date: str,
+    limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_MAX_PAGE_SIZE),
+    cursor: str | None = None
+):
     # valida formato
     try:
         datetime.datetime.strptime(date, "%Y-%m-%d")
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format")
 
-    today = datetime.datetime.now().strftime("%Y-%m-%d")
-
-    # 1) se for hoje -> lê do diário (é onde /food/add grava)
-    if date == today:
-      cursor = daily_log_intake_collection.find({"user_id": user_id, "date": date})
-      foods = await cursor.to_list(length=100)
-    else:
-      # 2) se for dia passado -> tenta primeiro no histórico
-      cursor = historical_log_intake_collection.find({"user_id": user_id, "date": date})
-      foods = await cursor.to_list(length=100)
+    if FOOD_LOG_BUCKETS:
+        # no modo buckets não há diário x histórico: o balde do dia é a fonte
+        _, after = page_cursor(cursor)
+        foods, next_cursor = await bucket_page(user_id, date, limit, after)
+        return page_response(foods, next_cursor)
 
-      # 3) fallback: se não achou no histórico (ex.: cron não rodou),
-      # tenta no diário mesmo assim
-      if not foods:
-        cursor = daily_log_intake_collection.find({"user_id": user_id, "date": date})
-        foods = await cursor.to_list(length=100)
+    today = datetime.datetime.now().strftime("%Y-%m-%d")
+    sources = {"daily": daily_log_intake_collection, "historical": historical_log_intake_collection}
+    query = {"user_id": user_id, "date": date}
+
+    # páginas seguintes continuam na coleção de onde veio a primeira
+    source, after = page_cursor(cursor)
+    if source is None:
+        # 1) se for hoje -> lê do diário (é onde /food/add grava)
+        # 2) se for dia passado -> tenta primeiro no histórico
+        source = "daily" if date == today else "historical"
+    elif source not in sources:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    foods, next_cursor = await fetch_page(sources[source], query, FOOD_LOG_PROJECTION, limit, after, source)
+
+    # 3) fallback: se não achou no histórico (ex.: cron não rodou),
+    # tenta no diário mesmo assim
+    if not foods and after is None and source == "historical":
+        foods, next_cursor = await fetch_page(daily_log_intake_collection, query, FOOD_LOG_PROJECTION,
+                                              limit, source="daily")
 
     # sempre devolver lista, nunca erro
-    if not foods:
-        return []
-
-    for food in foods:
-        food["_id"] = str(food["_id"])
-
-    return foods
+    return page_response(foods, next_cursor)
 
 
 @app.post("/recipes/save")
-async def save_recipe(recipe: dict):
+async def save_recipe(recipe: dict, compute_macros: bool = False):
     user_id = recipe.get("user_id")
     if not user_id:
         raise HTTPException(status_code=400, detail="User ID é obrigatório")
@@ -405,24 +1167,34 @@ async def save_recipe(recipe: dict):
     # Garante que o user_id esteja no documento
     recipe["user_id"] = user_id
 
+    # opcional: macros calculados aqui a partir dos ingredientes, não pelo cliente
+    if compute_macros:
+        recipe.update(recipe_macros(recipe.get("ingredients")) or {})
+
+    # nome normalizado gravado uma vez, usado pelo índice de busca
+    recipe.update(search_fields(recipe.get("name")))
+
     result = await recipes_collection.insert_one(recipe)
+    index_recipe(recipe)
+    invalidate_recipe_search(recipe["search_text"])
     return {"inserted_id": str(result.inserted_id)}
 
 @app.get("/recipes/list")
-async def list_recipes(user_id: str = Query(..., description="ID do usuário")):
+async def list_recipes(
+    user_id: str = Query(..., description="ID do usuário"),
+    limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_MAX_PAGE_SIZE),
+    cursor: str | None = None
+):
     if not user_id:
         raise HTTPException(status_code=400, detail="Parâmetro user_id é obrigatório")
 
-    cursor = recipes_collection.find({"user_id": user_id})
-    recipes = await cursor.to_list(length=100)
-
-    for r in recipes:
-        r["_id"] = str(r["_id"])
-
-    return recipes
+    _, after = page_cursor(cursor)
+    recipes, next_cursor = await fetch_page(recipes_collection, {"user_id": user_id}, RECIPE_PROJECTION,
+                                            limit, after)
+    return page_response(recipes, next_cursor)
 
 @app.put("/recipes/update/{recipe_id}")
-async def update_recipe(recipe_id: str, recipe: dict):
+async def update_recipe(recipe_id: str, recipe: dict, compute_macros: bool = False):
     if not ObjectId.is_valid(recipe_id):
         raise HTTPException(status_code=400, detail="Invalid ID format")
 
@@ -449,6 +1221,9 @@ async def update_recipe(recipe_id: str, recipe: dict):
         "carbo": recipe.get("carbo"),
         "gordura": recipe.get("gordura")
     }
+    if compute_macros:
+        update_data.update(recipe_macros(update_data["ingredients"]) or {})
+    update_data.update(search_fields(update_data["name"]))
 
     result = await recipes_collection.update_one(
         {"_id": ObjectId(recipe_id)},
@@ -458,6 +1233,9 @@ async def update_recipe(recipe_id: str, recipe: dict):
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Recipe not found")
 
+    index_recipe({**stored_recipe, **update_data})
+    invalidate_recipe_search(stored_search_fields(stored_recipe, "name")[0], update_data["search_text"])
+
     return {"msg": "Updated"}
 
 @app.delete("/recipes/delete/{recipe_id}")
@@ -478,30 +1256,103 @@ async def delete_recipe(recipe_id: str, user_id: str = Query(...)):
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Recipe not found")
 
+    unindex_recipe(recipe_id, recipe.get("user_id"))
+    invalidate_recipe_search(stored_search_fields(recipe, "name")[0])
+
     return {"msg": "Deleted"}
 
-@app.post("/cron/rollover")
-async def rollover_daily_food():
-    today = datetime.datetime.now().strftime("%Y-%m-%d")
-    yesterday = (datetime.datetime.now() - datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+async def rollover_move_chunk(docs: list[dict]):
+    # upsert no histórico antes de apagar do diário: repetir o lote é inofensivo
+    await historical_log_intake_collection.bulk_write(
+        [UpdateOne({"_id": doc["_id"]}, {"$set": doc}, upsert=True) for doc in docs],
+        ordered=False
+    )
+    await daily_log_intake_collection.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+
+async def rollover_reconcile_users(date: str) -> int:
+    source = log_days_collection if FOOD_LOG_BUCKETS else historical_log_intake_collection
+    user_ids = await source.distinct("user_id", {"date": date})
+    semaphore = asyncio.Semaphore(ROLLOVER_CONCURRENCY)
 
-    user_ids_processed = set()
-    cursor = daily_log_intake_collection.find({"date": yesterday})
-    moved = 0
+    async def reconcile_batch(batch):
+        async with semaphore:
+            return await reconcile_intake_totals({"date": date, "user_id": {"$in": batch}})
 
-    async for food in cursor:
-        # agora só garante que tá no histórico
-        await historical_log_intake_collection.update_one(
-            {"_id": food["_id"]},
-            {"$set": food},
+    batches = [user_ids[i:i + ROLLOVER_USERS_PER_BATCH]
+               for i in range(0, len(user_ids), ROLLOVER_USERS_PER_BATCH)]
+    results = await asyncio.gather(*(reconcile_batch(batch) for batch in batches))
+    return sum(sum(result["repaired"].values()) for result in results)
+
+@app.post("/cron/rollover")
+async def rollover_daily_food(date: str | None = None, force: bool = False):
+    if date:
+        try:
+            datetime.datetime.strptime(date, "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format")
+    yesterday = date or (datetime.datetime.now() - datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+
+    # checkpoint em meta_collection: uma execução que caiu retoma do último lote
+    checkpoint_key = {"_id": f"rollover:{yesterday}"}
+    checkpoint = await meta_collection.find_one(checkpoint_key) or {}
+    if checkpoint.get("phase") == "done" and not force:
+        return {"message": "Rollover already completed", "moved": checkpoint.get("moved", 0),
+                "date": yesterday, "timings": checkpoint.get("timings", {})}
+
+    resumed = bool(checkpoint) and not force
+    moved = checkpoint.get("moved", 0) if resumed else 0
+    last_id = checkpoint.get("last_id") if resumed else None
+    timings = {}
+
+    # 1) move os itens de ontem em lotes de tamanho fixo, em ordem de _id
+    # (no modo buckets não há o que mover: o balde do dia já é o histórico)
+    started = time.perf_counter()
+    while not FOOD_LOG_BUCKETS:
+        query = {"date": yesterday}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        docs = await daily_log_intake_collection.find(query).sort("_id", 1).to_list(length=ROLLOVER_CHUNK_SIZE)
+        if not docs:
+            break
+        await rollover_move_chunk(docs)
+        moved += len(docs)
+        last_id = docs[-1]["_id"]
+        await meta_collection.update_one(
+            checkpoint_key,
+            {"$set": {"phase": "move", "last_id": last_id, "moved": moved}},
             upsert=True
         )
-        # e remove do diário
-        await daily_log_intake_collection.delete_one({"_id": food["_id"]})
-        user_ids_processed.add(food["user_id"])
-        moved += 1
-
-    for user_id in user_ids_processed:
-        await update_historical_intake(user_id, yesterday)
+    timings["move_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    # 2) os totais já estão em dia pelos $inc; aqui só corrige eventual drift,
+    # com concorrência limitada entre grupos de usuários
+    started = time.perf_counter()
+    repaired = await rollover_reconcile_users(yesterday)
+    timings["reconcile_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    await meta_collection.update_one(
+        checkpoint_key,
+        {"$set": {"phase": "done", "moved": moved, "timings": timings,
+                  "finished_at": datetime.datetime.now(datetime.timezone.utc)}},
+        upsert=True
+    )
 
-    return {"message": "Rollover completed", "moved": moved}
+    return {"message": "Rollover completed", "moved": moved, "date": yesterday,
+            "resumed": resumed, "repaired": repaired, "timings": timings}
+
+@app.post("/cron/rollups/rebuild")
+async def rebuild_rollups(user_id: str | None = None):
+    rebuilt = await rebuild_intake_rollups({"user_id": user_id} if user_id else {})
+    return {"message": "Rollups rebuilt", "periods": rebuilt}
+
+@app.post("/cron/reconcile")
+async def reconcile_totals(days: int = Query(2, ge=1, le=366), user_id: str | None = None):
+    # só dias fechados: hoje ainda recebe escritas, inclusive de outros workers,
+    # cujas escritas em andamento este processo não enxerga
+    now = datetime.datetime.now()
+    start = (now - datetime.timedelta(days=days)).strftime("%Y-%m-%d")
+    match = {"date": {"$gte": start, "$lt": now.strftime("%Y-%m-%d")}}
+    if user_id:
+        match["user_id"] = user_id
+    result = await reconcile_intake_totals(match)
+    return {"message": "Reconciliation completed", **result}
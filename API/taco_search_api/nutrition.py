@@ -0,0 +1,65 @@
+"""
+Cálculo de macros a partir da TACO, vetorizado com NumPy.
+
+O data_import.py grava os valores da TACO por grama, então o total de uma
+lista de (food_id, gramas) é um produto matriz-vetor. NutrientMatrix guarda
+uma linha por alimento (colunas na ordem de MACRO_FIELDS) e calcula os totais
+de várias listas de uma vez: uma indexação da matriz e um bincount por coluna,
+sem laço em Python por item.
+"""
+
+import numpy as np
+
+MACRO_FIELDS = ("calorias", "proteinas", "carbo", "gordura")
+# coluna da TACO (por grama) correspondente a cada campo de MACRO_FIELDS
+TACO_FIELDS = ("calorias_kcal", "proteinas_g", "carbo_g", "gordura_g")
+
+
+def _per_gram(value) -> float:
+    # valores ausentes ("NA", "Tr" etc. viram None no import) contam como zero
+    return float(value) if isinstance(value, (int, float)) and value == value else 0.0
+
+
+class NutrientMatrix:
+    def __init__(self, foods=()):
+        foods = list(foods)
+        self._rows = {food["_id"]: row for row, food in enumerate(foods)}
+        self.matrix = np.array(
+            [[_per_gram(food.get(field)) for field in TACO_FIELDS] for food in foods],
+            dtype=np.float64
+        ).reshape(len(foods), len(TACO_FIELDS))
+        self.matrix.flags.writeable = False
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, food_id) -> bool:
+        return food_id in self._rows
+
+    def compute(self, lists: list[list[tuple[int, float]]]) -> tuple[np.ndarray, np.ndarray, list[list[int]]]:
+        """
+        Totais de cada lista: (macros[len(lists), 4], gramas[len(lists)], ids
+        ausentes por lista). Itens com id fora da TACO entram nas gramas, mas
+        não nos macros.
+        """
+        groups, rows, grams = [], [], []
+        total_grams = [0.0] * len(lists)
+        missing = [[] for _ in lists]
+        for group, items in enumerate(lists):
+            for food_id, amount in items:
+                total_grams[group] += amount
+                row = self._rows.get(food_id)
+                if row is None:
+                    missing[group].append(food_id)
+                    continue
+                groups.append(group)
+                rows.append(row)
+                grams.append(amount)
+
+        groups = np.asarray(groups, dtype=np.intp)
+        grams = np.asarray(grams, dtype=np.float64)
+        contributions = self.matrix[np.asarray(rows, dtype=np.intp)] * grams[:, None]
+        totals = np.zeros((len(lists), len(TACO_FIELDS)))
+        for column in range(len(TACO_FIELDS)):
+            totals[:, column] = np.bincount(groups, weights=contributions[:, column], minlength=len(lists))
+        return totals, np.asarray(total_grams, dtype=np.float64), missing
@@ -0,0 +1,57 @@
+"""
+Paginação por cursor (keyset) nas listagens.
+
+As listagens filtram por usuário (e dia) e ordenam por _id, com índice que
+termina em _id. Cada página é uma busca `_id > último` com limit + 1: custo
+constante, sem skip, e sem perder itens gravados entre uma página e outra.
+
+O cursor é opaco para o cliente: base64 de "<origem>:<último _id>", onde a
+origem diz de qual coleção a página veio (ex.: /food/history lê do histórico
+ou do diário e as páginas seguintes precisam continuar na mesma).
+"""
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from bson import ObjectId
+from bson.errors import InvalidId
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(last_id: ObjectId, source: str = "") -> str:
+    return urlsafe_b64encode(f"{source}:{last_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, ObjectId]:
+    try:
+        raw = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        source, last_id = raw.rsplit(":", 1)
+        return source, ObjectId(last_id)
+    except (Base64Error, UnicodeDecodeError, ValueError, InvalidId):
+        raise InvalidCursor(cursor)
+
+
+async def fetch_page(collection, query: dict, projection: dict | None, limit: int,
+                     after: ObjectId | None = None, source: str = "") -> tuple[list[dict], str | None]:
+    """Uma página de `query` em ordem de _id e o cursor da próxima (ou None)."""
+    if after is not None:
+        query = {**query, "_id": {"$gt": after}}
+    docs = await collection.find(query, projection).sort("_id", 1).to_list(length=limit + 1)
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    return docs, encode_cursor(docs[-1]["_id"], source)
+
+
+def slice_page(docs: list[dict], limit: int, after: ObjectId | None = None,
+               source: str = "") -> tuple[list[dict], str | None]:
+    """Mesma página de fetch_page, sobre uma lista já em memória (ex.: itens de um balde)."""
+    docs = sorted((doc for doc in docs if after is None or doc["_id"] > after), key=lambda doc: doc["_id"])
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    return docs, encode_cursor(docs[-1]["_id"], source)
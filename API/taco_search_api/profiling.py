@@ -0,0 +1,132 @@
+"""
+Profiling opcional de uma única requisição.
+
+Só existe quando PROFILING_ENABLED=1: nesse caso o main.py instala o
+ProfilingMiddleware; desligado, nada é instalado e o custo é zero.
+
+Uma requisição é perfilada quando traz o header `X-Profile` (ou o parâmetro
+`__profile` na query) com um dos modos:
+- `cprofile` (ou `1`): perfil determinístico, salvo como .pstats
+  (abra com `python -m pstats arquivo` ou snakeviz);
+- `sample`: amostragem da pilha da thread do event loop a cada
+  PROFILING_SAMPLE_INTERVAL segundos, salva em formato "collapsed stacks"
+  (flamegraph.pl / speedscope).
+
+Se PROFILING_TOKEN estiver definido, o header `X-Profile-Token` precisa bater.
+O perfil cobre tudo o que roda no event loop até o envio dos headers: os
+helpers de busca e agregação e a serialização da resposta. O nome do arquivo
+gerado em PROFILING_DIR volta no header `X-Profile-File`. Apenas uma requisição
+é perfilada por vez; as demais seguem normalmente.
+"""
+
+from collections import Counter
+from urllib.parse import parse_qs
+import cProfile
+import datetime
+import os
+import re
+import sys
+import threading
+
+MODES = {"1": "cprofile", "cprofile": "cprofile", "sample": "sample"}
+
+
+class StackSampler:
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def dump(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfilingMiddleware:
+    def __init__(self, app, output_dir: str = "profiles", token: str | None = None,
+                 sample_interval: float = 0.001):
+        self.app = app
+        self.output_dir = output_dir
+        self.token = token
+        self.sample_interval = sample_interval
+        self._busy = False
+
+    def _requested_mode(self, scope) -> str | None:
+        headers = dict(scope.get("headers") or [])
+        value = headers.get(b"x-profile", b"").decode()
+        if not value:
+            query = parse_qs(scope.get("query_string", b"").decode())
+            value = (query.get("__profile") or [""])[0]
+        mode = MODES.get(value.lower())
+        if mode and self.token and headers.get(b"x-profile-token", b"").decode() != self.token:
+            return None
+        return mode
+
+    async def __call__(self, scope, receive, send):
+        mode = self._requested_mode(scope) if scope["type"] == "http" else None
+        if mode is None or self._busy:
+            await self.app(scope, receive, send)
+            return
+
+        self._busy = True
+        os.makedirs(self.output_dir, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        extension = "pstats" if mode == "cprofile" else "collapsed"
+        filename = f"{stamp}-{scope['method']}-{slug}.{extension}"
+
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = StackSampler(threading.get_ident(), self.sample_interval)
+            profiler.start()
+
+        stopped = False
+
+        def finish():
+            nonlocal stopped
+            if stopped:
+                return
+            stopped = True
+            path = os.path.join(self.output_dir, filename)
+            if mode == "cprofile":
+                profiler.disable()
+                profiler.dump_stats(path)
+            else:
+                profiler.stop()
+                profiler.dump(path)
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                finish()
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (b"x-profile-file", filename.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            finish()
+            self._busy = False
@@ -0,0 +1,28 @@
+"""
+Serialização JSON rápida das respostas.
+
+FastJSONResponse serializa com orjson e entende ObjectId (vira string), então
+os documentos do Mongo podem ser devolvidos como vieram, sem o laço de
+`str(_id)`. Os endpoints de leitura devolvem a resposta já pronta, o que pula o
+jsonable_encoder do FastAPI (que percorre e copia cada dict e cada float).
+"""
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+import orjson
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default,
+                        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
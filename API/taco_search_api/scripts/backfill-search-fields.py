@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Backfill dos campos de busca normalizados (search_text, search_tokens).
+
+O data_import.py e /recipes/save|update já gravam esses campos; este script
+preenche os documentos antigos da TACO e das receitas, para que o índice de
+busca da API só leia o que está gravado. Enquanto não roda, a API calcula os
+campos ao montar o índice, então nada quebra.
+
+Requer:
+  pip install motor python-dotenv Unidecode
+
+Ambiente esperado (iguais aos da sua API):
+  MONGO_URI, DB_NAME, COLLECTION_NAME (TACO), COLLECTION_NAME5 (receitas)
+
+Uso:
+  python scripts/backfill-search-fields.py [--force] [--batch-size N]
+
+  --force   recalcula todos os documentos, não só os que não têm os campos
+            (ex.: depois de mudar normalize_text)
+"""
+
+import os
+import sys
+import asyncio
+import argparse
+
+import motor.motor_asyncio
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_utils import search_fields  # noqa: E402
+
+MISSING_FIELDS = {"$or": [{"search_text": {"$exists": False}}, {"search_tokens": {"$exists": False}}]}
+
+
+async def backfill(collection, source_field: str, force: bool, batch_size: int) -> int:
+    query = {} if force else MISSING_FIELDS
+    updated = 0
+    operations = []
+    async for doc in collection.find(query, {source_field: 1}):
+        operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": search_fields(doc.get(source_field))}))
+        if len(operations) >= batch_size:
+            await collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+            operations = []
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+        updated += len(operations)
+    return updated
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--force", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    load_dotenv()
+    mongo_uri = os.getenv("MONGO_URI")
+    db_name = os.getenv("DB_NAME")
+    if not mongo_uri or not db_name:
+        raise RuntimeError("Defina MONGO_URI e DB_NAME no ambiente (.env).")
+
+    client = motor.motor_asyncio.AsyncIOMotorClient(mongo_uri)
+    db = client[db_name]
+    targets = [
+        (db[os.getenv("COLLECTION_NAME", "taco_table")], "description"),
+        (db[os.getenv("COLLECTION_NAME5", "recipes")], "name"),
+    ]
+
+    for collection, source_field in targets:
+        updated = await backfill(collection, source_field, args.force, args.batch_size)
+        print(f"{collection.name:<20} {updated} documentos atualizados")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark da busca aproximada sobre a tabela TACO completa.
+
+Compara, para um conjunto de consultas, a implementação antiga
+(levenshtein com DP completa por candidato) com:
+  - bounded_levenshtein (faixa diagonal + saída antecipada)
+  - MyersMatcher em lote (bit-paralelo, consulta pré-processada uma vez)
+
+Também confere que as três concordam em quais descrições casam.
+
+Requer:
+  pip install pandas openpyxl unidecode
+
+Uso:
+  python scripts/bench-fuzzy.py [--repeat 5] [consulta ...]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fuzzy import MyersMatcher, bounded_levenshtein  # noqa: E402
+from text_utils import normalize_text  # noqa: E402
+
+MAX_DISTANCE = 2
+DEFAULT_QUERIES = ["ar", "arroz", "arroz integral", "feijao", "fejao", "frnago", "brocolis", "banana prata"]
+
+
+# -----------------------
+# Implementação antiga (cópia de referência)
+# -----------------------
+def legacy_levenshtein(a: str, b: str) -> int:
+    if a == b:
+        return 0
+    if len(a) == 0:
+        return len(b)
+    if len(b) == 0:
+        return len(a)
+
+    previous_row = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current_row = [i]
+        for j, cb in enumerate(b, start=1):
+            insert_cost = previous_row[j] + 1
+            delete_cost = current_row[j - 1] + 1
+            replace_cost = previous_row[j - 1] + (ca != cb)
+            current_row.append(min(insert_cost, delete_cost, replace_cost))
+        previous_row = current_row
+    return previous_row[-1]
+
+
+def legacy_matches(query, texts):
+    return [legacy_levenshtein(query, t[:len(query) + 2]) <= MAX_DISTANCE for t in texts]
+
+
+def bounded_matches(query, texts):
+    return [bounded_levenshtein(query, t[:len(query) + MAX_DISTANCE], MAX_DISTANCE) is not None for t in texts]
+
+
+def myers_matches(query, texts):
+    matcher = MyersMatcher(query)
+    window = len(query) + MAX_DISTANCE
+    return [matcher.distance(t[:window], MAX_DISTANCE) is not None for t in texts]
+
+
+def load_descriptions():
+    excel_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Taco-4a-Edicao.xlsx")
+    df = pd.read_excel(excel_path, engine="openpyxl")
+    descriptions = df["Descrição dos alimentos"].dropna().astype(str).tolist()
+    return [normalize_text(d) for d in descriptions]
+
+
+def timed(fn, query, texts, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(query, texts)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("queries", nargs="*", default=DEFAULT_QUERIES)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = load_descriptions()
+    print(f"{len(texts)} descrições TACO carregadas\n")
+    print(f"{'consulta':<16}{'casam':>7}{'legado ms':>12}{'faixa ms':>11}{'myers ms':>11}{'ganho':>8}")
+
+    totals = {"legacy": 0.0, "bounded": 0.0, "myers": 0.0}
+    for query in (normalize_text(q) for q in args.queries):
+        t_legacy, r_legacy = timed(legacy_matches, query, texts, args.repeat)
+        t_bounded, r_bounded = timed(bounded_matches, query, texts, args.repeat)
+        t_myers, r_myers = timed(myers_matches, query, texts, args.repeat)
+        if not (r_legacy == r_bounded == r_myers):
+            raise AssertionError(f"Resultados divergentes para '{query}'")
+
+        totals["legacy"] += t_legacy
+        totals["bounded"] += t_bounded
+        totals["myers"] += t_myers
+        print(f"{query:<16}{sum(r_legacy):>7}{t_legacy * 1000:>12.2f}{t_bounded * 1000:>11.2f}"
+              f"{t_myers * 1000:>11.2f}{t_legacy / t_myers:>7.1f}x")
+
+    print(f"\nTotal: legado {totals['legacy'] * 1000:.1f} ms | faixa {totals['bounded'] * 1000:.1f} ms"
+          f" | myers {totals['myers'] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
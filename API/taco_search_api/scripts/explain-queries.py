@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Diagnóstico dos planos de consulta da API.
+
+Para cada formato de consulta usado pelos endpoints (ver indexes.query_shapes),
+roda explain() no MongoDB e mostra os estágios do plano vencedor, marcando as
+consultas que fazem varredura completa da coleção (COLLSCAN).
+
+Requer:
+  pip install motor python-dotenv
+
+Ambiente esperado (iguais aos da sua API):
+  MONGO_URI, DB_NAME, COLLECTION_NAME1..COLLECTION_NAME5, (opcionais) COLLECTION_NAME7
+  e COLLECTION_NAME8 (baldes por dia de FOOD_LOG_STORAGE=buckets)
+
+Uso:
+  python scripts/explain-queries.py [--ensure] [--user-id ID]
+
+  --ensure   cria os índices antes (o mesmo que o startup da API faz)
+
+Sai com código 1 se alguma consulta fizer COLLSCAN.
+"""
+
+import os
+import sys
+import asyncio
+import argparse
+
+import motor.motor_asyncio
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexes import ensure_indexes, explain_query_shapes  # noqa: E402
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ensure", action="store_true")
+    parser.add_argument("--user-id", default="explain-user")
+    args = parser.parse_args()
+
+    load_dotenv()
+    mongo_uri = os.getenv("MONGO_URI")
+    db_name = os.getenv("DB_NAME")
+    if not mongo_uri or not db_name:
+        raise RuntimeError("Defina MONGO_URI e DB_NAME no ambiente (.env).")
+
+    client = motor.motor_asyncio.AsyncIOMotorClient(mongo_uri)
+    db = client[db_name]
+    collections = {
+        "daily_intake": db[os.getenv("COLLECTION_NAME1", "daily_intake")],
+        "historical_intake": db[os.getenv("COLLECTION_NAME2", "historical_intake")],
+        "daily_log": db[os.getenv("COLLECTION_NAME3", "daily_food_log")],
+        "historical_log": db[os.getenv("COLLECTION_NAME4", "historical_food_log")],
+        "recipes": db[os.getenv("COLLECTION_NAME5", "recipes")],
+        "rollups": db[os.getenv("COLLECTION_NAME7", "intake_rollups")],
+        # sempre verificada, para que a troca de modo não encontre índice faltando
+        "log_days": db[os.getenv("COLLECTION_NAME8", "food_log_days")],
+    }
+
+    if args.ensure:
+        created = await ensure_indexes(collections)
+        for name, names in created.items():
+            print(f"  índices em {name}: {', '.join(names) or '-'}")
+        print()
+
+    report = await explain_query_shapes(collections, args.user_id)
+    collscans = 0
+    for entry in report:
+        flag = "COLLSCAN" if entry["collscan"] else "ok"
+        collscans += entry["collscan"]
+        print(f"[{flag:>8}] {entry['endpoint']:<36} {entry['collection']:<18} {' > '.join(entry['stages'])}")
+
+    print(f"\n{len(report)} consultas verificadas, {collscans} com COLLSCAN.")
+    return 1 if collscans else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de carga reprodutível da API.
+
+- Semeia um banco local com N usuários x D dias de histórico, usando a mesma
+  geração do seed-historical.py (build_day), mais os itens de ontem no diário
+  para o rollover.
+- Sobe a app FastAPI no próprio processo (ASGI, com lifespan) e dispara
+  clientes concorrentes contra cada endpoint, uma fase por endpoint.
+- Mede p50/p95/p99, vazão e operações Mongo por requisição, e grava tudo em
+  JSON para comparar execuções (--compare).
+
+Bancos:
+  --backend mock   mongomock-motor em memória (pip install mongomock-motor)
+  --backend mongo  um mongod local de verdade em MONGO_URI (ex.: docker run mongo)
+                   ATENÇÃO: as coleções do banco dieti_loadtest são apagadas
+                   antes do seed. O DB_NAME do ambiente é ignorado e URIs que
+                   não apontam para localhost são recusadas, a não ser com
+                   --i-know-this-wipes-data.
+
+Requer:
+  pip install httpx openpyxl (+ as dependências da API)
+
+Uso:
+  python scripts/load-test.py --users 50 --days 90 --requests 300 --concurrency 16
+  python scripts/load-test.py --out results/depois.json --compare results/antes.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import datetime
+import platform
+import importlib.util
+import subprocess
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+# sempre aplicados (não setdefault): um DB_NAME exportado de produção não vale aqui
+LOADTEST_ENV = {
+    "DB_NAME": "dieti_loadtest",
+    "COLLECTION_NAME": "taco_table",
+    "COLLECTION_NAME1": "daily_intake",
+    "COLLECTION_NAME2": "historical_intake",
+    "COLLECTION_NAME3": "daily_food_log",
+    "COLLECTION_NAME4": "historical_food_log",
+    "COLLECTION_NAME5": "recipes",
+}
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+# métodos de coleção que viram uma ida ao Mongo
+MONGO_OPERATIONS = {
+    "find", "find_one", "find_one_and_update", "find_one_and_delete", "insert_one", "insert_many",
+    "update_one", "update_many", "delete_one", "delete_many", "bulk_write", "aggregate",
+    "count_documents", "distinct", "replace_one",
+}
+
+
+class CountingCollection:
+    """Proxy de coleção que conta as operações feitas pela API."""
+
+    def __init__(self, collection, counter: dict):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        if name in MONGO_OPERATIONS:
+            self._counter["ops"] += 1
+        return getattr(self._collection, name)
+
+    def __getitem__(self, name):
+        return self._collection[name]
+
+
+def load_seed_module():
+    path = os.path.join(API_DIR, "scripts", "seed-historical.py")
+    spec = importlib.util.spec_from_file_location("seed_historical", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_taco_docs():
+    # mesmo parse e mesmos registros (com os campos de busca) do data_import.py
+    from data_import import parse_excel, iter_records
+
+    return list(iter_records(parse_excel(os.path.join(API_DIR, "Taco-4a-Edicao.xlsx"))))
+
+
+def is_local_uri(uri: str) -> bool:
+    """Se todos os hosts de uma URI mongodb:// são a própria máquina."""
+    scheme, _, rest = uri.partition("://")
+    if scheme != "mongodb" or not rest:
+        # mongodb+srv sempre resolve para um cluster remoto
+        return False
+    hosts = rest.split("/", 1)[0].rsplit("@", 1)[-1]
+    for host in hosts.split(","):
+        if host.startswith("["):
+            name = host[1:].split("]", 1)[0]
+        else:
+            name = host.split(":", 1)[0]
+        if name.lower() not in LOCAL_HOSTS:
+            return False
+    return True
+
+
+def import_app(backend: str, allow_remote: bool = False):
+    os.environ.update(LOADTEST_ENV)
+
+    if backend == "mock":
+        import motor.motor_asyncio
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("--backend mock requer: pip install mongomock-motor")
+
+        class StandInClient(AsyncMongoMockClient):
+            def __init__(self, *args, **kwargs):
+                super().__init__()
+
+        motor.motor_asyncio.AsyncIOMotorClient = StandInClient
+        os.environ.setdefault("MONGO_URI", "mongodb://stand-in")
+    elif not os.getenv("MONGO_URI"):
+        raise SystemExit("--backend mongo requer MONGO_URI apontando para um mongod local.")
+    elif not is_local_uri(os.environ["MONGO_URI"]) and not allow_remote:
+        raise SystemExit("MONGO_URI não aponta para localhost e o seed apaga as coleções do banco "
+                         f"{LOADTEST_ENV['DB_NAME']}. Use --i-know-this-wipes-data para continuar.")
+
+    import main
+    return main
+
+
+async def seed(main, seed_module, args, rng):
+    for name in ("food_collection", "daily_intake_collection", "historical_intake_collection",
+                 "daily_log_intake_collection", "historical_log_intake_collection",
+                 "recipes_collection", "meta_collection", "rollups_collection", "log_days_collection"):
+        await getattr(main, name).delete_many({})
+
+    foods = load_taco_docs()
+    await main.food_collection.insert_many(foods)
+
+    users = [f"loadtest-user-{i:05d}" for i in range(args.users)]
+    today = datetime.date.today()
+    yesterday = (today - datetime.timedelta(days=1)).isoformat()
+
+    started = time.perf_counter()
+    log_docs = 0
+    for user_id in users:
+        history_logs, totals = [], []
+        for delta in range(2, args.days + 2):
+            date_str = (today - datetime.timedelta(days=delta)).isoformat()
+            day_logs, total = seed_module.build_day(foods, user_id, date_str, args.items_per_day,
+                                                    30, 300, rng)
+            history_logs += day_logs
+            totals.append(total)
+        if history_logs:
+            await main.historical_log_intake_collection.insert_many(history_logs)
+            await main.historical_intake_collection.insert_many(totals)
+
+        # ontem ainda no diário, para o rollover ter o que mover
+        day_logs, total = seed_module.build_day(foods, user_id, yesterday, args.items_per_day, 30, 300, rng)
+        await main.daily_log_intake_collection.insert_many(day_logs)
+        await main.daily_intake_collection.insert_one(dict(total))
+        await main.historical_intake_collection.insert_one(dict(total))
+        log_docs += len(history_logs) + len(day_logs)
+
+        await main.recipes_collection.insert_one({
+            "user_id": user_id,
+            "name": f"Receita {rng.choice(foods)['description']}",
+            "ingredients": [],
+            "calorias": 500.0, "proteinas": 20.0, "carbo": 60.0, "gordura": 15.0,
+        })
+
+    await main.rebuild_intake_rollups({})
+    elapsed = time.perf_counter() - started
+    print(f"Seed: {len(users)} usuários, {log_docs} itens em {elapsed:.1f}s")
+    return users, foods
+
+
+def search_queries(foods, rng, count):
+    from text_utils import normalize_text
+
+    queries = []
+    for _ in range(count):
+        words = normalize_text(rng.choice(foods)["description"]).split()
+        word = words[0] if words else "arroz"
+        queries.append(word[:rng.randint(2, max(2, len(word)))])
+    return queries
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+async def run_phase(client, counter, make_request, total, concurrency):
+    latencies = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            method, url, kwargs = make_request(index)
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400 and response.status_code != 404:
+                errors += 1
+
+    counter["ops"] = 0
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "mongo_ops_per_request": round(counter["ops"] / total, 2) if total else 0.0,
+    }
+
+
+async def run(args):
+    import httpx
+
+    rng = random.Random(args.seed)
+    main = import_app(args.backend, args.i_know_this_wipes_data)
+    seed_module = load_seed_module()
+    users, foods = await seed(main, seed_module, args, rng)
+
+    counter = {"ops": 0}
+    for name in list(vars(main)):
+        if name.endswith("_collection"):
+            setattr(main, name, CountingCollection(getattr(main, name), counter))
+
+    queries = search_queries(foods, rng, args.requests)
+    today = datetime.date.today().isoformat()
+    year_ago = (datetime.date.today() - datetime.timedelta(days=365)).isoformat()
+
+    phases = {
+        "search_combined": lambda i: ("GET", "/search/combined",
+                                      {"params": {"q": queries[i], "user_id": users[i % len(users)]}}),
+        "food_add": lambda i: ("POST", "/food/add", {"json": {
+            "user_id": users[i % len(users)],
+            "description": foods[i % len(foods)]["description"],
+            "grams": 100, "calorias": 120.0, "proteinas": 5.0, "carbo": 20.0, "gordura": 2.0,
+            "date": today,
+        }}),
+        "intake_history_365d": lambda i: ("GET", "/intake/history",
+                                          {"params": {"user_id": users[i % len(users)], "days": 365}}),
+        "intake_history_month": lambda i: ("GET", "/intake/history", {"params": {
+            "user_id": users[i % len(users)], "granularity": "month", "from": year_ago}}),
+    }
+
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=120) as client:
+            for name, make_request in phases.items():
+                results[name] = await run_phase(client, counter, make_request, args.requests, args.concurrency)
+                print_result(name, results[name])
+
+            # rollover: uma execução sobre o dia de ontem de todos os usuários
+            results["cron_rollover"] = await run_phase(
+                client, counter, lambda i: ("POST", "/cron/rollover", {"params": {"force": "true"}}), 1, 1
+            )
+            print_result("cron_rollover", results["cron_rollover"])
+
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "backend": args.backend,
+            "users": args.users,
+            "days": args.days,
+            "items_per_day": args.items_per_day,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "endpoints": results,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=API_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_result(name, result):
+    print(f"  {name:<22} p50 {result['p50_ms']:>9.2f} ms | p95 {result['p95_ms']:>9.2f} ms | "
+          f"p99 {result['p99_ms']:>9.2f} ms | {result['throughput_rps']:>8.1f} req/s | "
+          f"{result['mongo_ops_per_request']:>6.2f} ops/req | erros {result['errors']}")
+
+
+def print_comparison(current, previous_path):
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nComparação com {previous_path} ({previous['meta'].get('git_commit')}):")
+    for name, result in current["endpoints"].items():
+        before = previous["endpoints"].get(name)
+        if not before:
+            continue
+        deltas = []
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "mongo_ops_per_request"):
+            if before[metric]:
+                deltas.append(f"{metric} {100 * (result[metric] - before[metric]) / before[metric]:+.1f}%")
+        print(f"  {name:<22} {' | '.join(deltas)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["mock", "mongo"], default="mock")
+    parser.add_argument("--i-know-this-wipes-data", action="store_true",
+                        help="permite --backend mongo com MONGO_URI fora de localhost")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--items-per-day", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=300, help="requisições por endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=None, help="arquivo JSON de saída")
+    parser.add_argument("--compare", default=None, help="JSON de uma execução anterior")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+
+    out = args.out or os.path.join(
+        "loadtest-results", f"{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados gravados em {out}")
+
+    if args.compare:
+        print_comparison(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Monta os baldes por dia (FOOD_LOG_STORAGE=buckets, ver log_buckets.py) a partir
+dos itens já gravados em daily_log/historical_log.
+
+Cada (user_id, date) vira um documento com todos os itens do dia e os totais
+recalculados. O diário vence se o mesmo _id estiver nas duas coleções, como na
+reconciliação da API. Rodar de novo reescreve os baldes: é seguro repetir.
+
+As duas coleções são lidas em ordem de (user_id, date), pelo índice
+user_date_id, e intercaladas: só um dia de cada fica em memória, e os baldes
+são gravados a cada --batch-size.
+
+Rode com a API parada (ou ainda em FOOD_LOG_STORAGE=items) e troque o modo
+depois, para não perder itens gravados no meio.
+
+Requer:
+  pip install motor python-dotenv
+
+Ambiente esperado (iguais aos da sua API):
+  MONGO_URI, DB_NAME, COLLECTION_NAME3 (diário), COLLECTION_NAME4 (histórico),
+  COLLECTION_NAME8 (baldes, padrão food_log_days)
+
+Uso:
+  python scripts/migrate-log-buckets.py [--user-id U] [--batch-size N]
+"""
+
+import os
+import sys
+import asyncio
+import argparse
+
+import motor.motor_asyncio
+from pymongo import ReplaceOne
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_buckets import bucket_document  # noqa: E402
+
+
+async def iter_days(collection, match: dict):
+    """(chave, itens) de cada (user_id, date), em ordem, de um cursor ordenado."""
+    key, items = None, []
+    cursor = collection.find(match).sort([("user_id", 1), ("date", 1), ("_id", 1)])
+    async for item in cursor:
+        item_key = (item["user_id"], item["date"])
+        if item_key != key and items:
+            yield key, items
+            items = []
+        key = item_key
+        items.append(item)
+    if items:
+        yield key, items
+
+
+async def _next(days):
+    return await anext(days, None)
+
+
+async def merged_days(historical, daily, match: dict):
+    """Dias das duas coleções intercalados por chave; o diário vence no mesmo _id."""
+    historical_days, daily_days = iter_days(historical, match), iter_days(daily, match)
+    h, d = await _next(historical_days), await _next(daily_days)
+    while h is not None or d is not None:
+        if d is None or (h is not None and h[0] < d[0]):
+            yield h
+            h = await _next(historical_days)
+        elif h is None or d[0] < h[0]:
+            yield d
+            d = await _next(daily_days)
+        else:
+            items = {item["_id"]: item for item in h[1]}
+            items.update((item["_id"], item) for item in d[1])
+            yield h[0], list(items.values())
+            h, d = await _next(historical_days), await _next(daily_days)
+
+
+async def migrate(historical, daily, buckets, match: dict, batch_size: int) -> int:
+    operations = []
+    written = 0
+    async for (user_id, date), items in merged_days(historical, daily, match):
+        doc = bucket_document(user_id, date, items)
+        operations.append(ReplaceOne({"user_id": user_id, "date": date}, doc, upsert=True))
+        if len(operations) >= batch_size:
+            await buckets.bulk_write(operations, ordered=False)
+            written += len(operations)
+            operations = []
+    if operations:
+        await buckets.bulk_write(operations, ordered=False)
+        written += len(operations)
+    return written
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", default=None)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    load_dotenv()
+    mongo_uri = os.getenv("MONGO_URI")
+    db_name = os.getenv("DB_NAME")
+    if not mongo_uri or not db_name:
+        raise RuntimeError("Defina MONGO_URI e DB_NAME no ambiente (.env).")
+
+    client = motor.motor_asyncio.AsyncIOMotorClient(mongo_uri)
+    db = client[db_name]
+    historical = db[os.getenv("COLLECTION_NAME4")]
+    daily = db[os.getenv("COLLECTION_NAME3")]
+    buckets = db[os.getenv("COLLECTION_NAME8", "food_log_days")]
+
+    match = {"user_id": args.user_id} if args.user_id else {}
+    written = await migrate(historical, daily, buckets, match, args.batch_size)
+    print(f"{buckets.name:<20} {written} baldes gravados")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
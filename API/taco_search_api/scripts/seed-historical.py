@@ -9,8 +9,19 @@ Seed de histórico (365 dias) a partir da coleção de alimentos (taco_table / T
   - insere todos os itens do dia em historical_food_log
   - upsert do total do dia em historical_intake
 
+Modo multiusuário (SEED_USERS > 0): semeia milhares de usuários
+("<USER_ID_PREFIX>-00000", ...) em paralelo, com no máximo SEED_CONCURRENCY
+usuários gravando ao mesmo tempo, para montar bases em escala de produção.
+- cada usuário tem a própria média de itens por dia (em torno de ITEMS_PER_DAY);
+  o número de itens de cada dia segue Poisson com essa média, e uma fração
+  SKIP_DAY_PROB dos dias fica sem registro;
+- itens e totais de um usuário são gerados de uma vez com NumPy e gravados com
+  um insert_many e um bulk_write;
+- ao final (e a cada 100 usuários) mostra documentos inseridos por segundo.
+Os rollups semanais/mensais não são gravados: rode /cron/rollups/rebuild depois.
+
 Requer:
-  pip install motor python-dotenv
+  pip install motor python-dotenv numpy
 
 Ambiente esperado (iguais aos da sua API):
   MONGO_URI
@@ -20,31 +31,40 @@ Ambiente esperado (iguais aos da sua API):
   COLLECTION_NAME4           -> historical_food_log
   (opcional) USER_ID         -> user alvo (default: "690e80cd7115ce452cd22688")
   (opcional) SEED_DAYS       -> qtd de dias (default: 365)
-  (opcional) ITEMS_PER_DAY   -> itens por dia (default: 10)
+  (opcional) ITEMS_PER_DAY   -> itens por dia (default: 10; média no modo multiusuário)
   (opcional) GRAMS_MIN       -> mínimo de gramas (default: 30)
   (opcional) GRAMS_MAX       -> máximo de gramas (default: 300)
+  (opcional) SEED_USERS      -> ativa o modo multiusuário com N usuários (default: 0)
+  (opcional) SEED_CONCURRENCY -> usuários gravando em paralelo (default: 8)
+  (opcional) USER_ID_PREFIX  -> prefixo dos usuários gerados (default: "seed-user")
+  (opcional) SKIP_DAY_PROB   -> fração de dias sem registro (default: 0.1)
 """
 
 import os
+import time
 import asyncio
 import random
 import datetime
-from decimal import Decimal, ROUND_HALF_UP
 
+import numpy as np
 import motor.motor_asyncio
 from bson import ObjectId
+from pymongo import UpdateOne
 from dotenv import load_dotenv
 
+# campos por grama na coleção base -> campos dos itens/totais
+MACRO_SOURCES = (("calorias", "calorias_kcal"), ("proteinas", "proteinas_g"),
+                 ("carbo", "carbo_g"), ("gordura", "gordura_g"))
+# calorias com 1 casa (fica legal no tooltip), o resto com 2
+ROUND_DECIMALS = np.array([1, 2, 2, 2])
+
 # -----------------------
 # Utils numéricos
 # -----------------------
-def f2(x: float) -> float:
-    """Arredonda para 2 casas (modo 'comercial')."""
-    return float(Decimal(x).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
-
-def f1(x: float) -> float:
-    """Arredonda para 1 casa."""
-    return float(Decimal(x).quantize(Decimal("0.1"), rounding=ROUND_HALF_UP))
+def round_half_up(values, decimals) -> np.ndarray:
+    """Arredondamento 'comercial' (meio para cima) vetorizado; valores >= 0."""
+    scale = 10.0 ** np.asarray(decimals)
+    return np.floor(np.asarray(values, dtype=np.float64) * scale + 0.5) / scale
 
 def coerce_float(v, default=0.0) -> float:
     try:
@@ -57,6 +77,119 @@ def coerce_float(v, default=0.0) -> float:
     except Exception:
         return default
 
+def per_gram_matrix(foods) -> np.ndarray:
+    return np.array(
+        [[coerce_float(food.get(source)) for _, source in MACRO_SOURCES] for food in foods],
+        dtype=np.float64
+    ).reshape(len(foods), len(MACRO_SOURCES))
+
+def make_log_docs(user_id, dates, descriptions, grams, macros) -> list[dict]:
+    rounded = round_half_up(macros, ROUND_DECIMALS).tolist()
+    return [
+        {
+            "_id": ObjectId(),  # mantém compatível com seu endpoint
+            "user_id": user_id,
+            "description": description,
+            "grams": g,
+            "calorias": cal,
+            "proteinas": pro,
+            "carbo": carb,
+            "gordura": gor,
+            "date": date_str
+        }
+        for date_str, description, g, (cal, pro, carb, gor) in zip(dates, descriptions, grams, rounded)
+    ]
+
+def make_total_doc(user_id, date_str, totals) -> dict:
+    cal, pro, carb, gor = round_half_up(totals, ROUND_DECIMALS).tolist()
+    return {"user_id": user_id, "date": date_str,
+            "calorias": cal, "proteinas": pro, "carbo": carb, "gordura": gor}
+
+# -----------------------
+# Geração de um dia
+# -----------------------
+def build_day(foods, user_id, date_str, items_day, grams_min, grams_max, rng=random):
+    """Itens (historical_food_log) e total (historical_intake) de um dia."""
+    # escolhe itens distintos para o dia
+    day_foods = rng.sample(foods, items_day)
+    grams = [rng.randint(grams_min, grams_max) for _ in day_foods]
+
+    macros = per_gram_matrix(day_foods) * np.asarray(grams, dtype=np.float64)[:, None]
+    descriptions = [food.get("description", "item") for food in day_foods]
+    log_docs = make_log_docs(user_id, [date_str] * len(day_foods), descriptions, grams, macros)
+    return log_docs, make_total_doc(user_id, date_str, macros.sum(axis=0))
+
+# -----------------------
+# Geração de um usuário (modo multiusuário)
+# -----------------------
+def build_user(matrix, descriptions, user_id, dates, items_mean, grams_min, grams_max, skip_prob, rng):
+    """Itens e totais de todos os dias de um usuário, gerados de uma vez."""
+    n_days = len(dates)
+    # cada usuário tem o seu ritmo: uns registram bem mais que outros
+    user_mean = items_mean * rng.lognormal(0.0, 0.35)
+    counts = np.clip(rng.poisson(user_mean, n_days), 1, len(descriptions))
+    counts[rng.random(n_days) < skip_prob] = 0
+
+    day_index = np.repeat(np.arange(n_days), counts)
+    food_index = rng.integers(0, len(descriptions), day_index.size)
+    grams = rng.integers(grams_min, grams_max + 1, day_index.size)
+    macros = matrix[food_index] * grams[:, None]
+
+    totals = np.zeros((n_days, len(MACRO_SOURCES)))
+    for column in range(len(MACRO_SOURCES)):
+        totals[:, column] = np.bincount(day_index, weights=macros[:, column], minlength=n_days)
+
+    log_docs = make_log_docs(user_id, [dates[i] for i in day_index.tolist()],
+                             [descriptions[i] for i in food_index.tolist()], grams.tolist(), macros)
+    total_docs = [make_total_doc(user_id, dates[i], totals[i]) for i in np.flatnonzero(counts).tolist()]
+    return log_docs, total_docs
+
+async def seed_many_users(foods, hist_intake_coll, hist_log_coll, n_users, dates, items_mean,
+                          grams_min, grams_max, skip_prob, concurrency, prefix, seed=None):
+    matrix = per_gram_matrix(foods)
+    descriptions = [food.get("description", "item") for food in foods]
+    date_range = {"$gte": dates[0], "$lte": dates[-1]}
+    semaphore = asyncio.Semaphore(concurrency)
+    seeds = np.random.SeedSequence(seed).spawn(n_users)
+    stats = {"users": 0, "logs": 0, "totals": 0}
+    started = time.perf_counter()
+
+    def report(label):
+        elapsed = time.perf_counter() - started
+        docs = stats["logs"] + stats["totals"]
+        print(f"  {label}: {stats['users']}/{n_users} usuários, {docs} docs "
+              f"em {elapsed:.1f}s ({docs / elapsed if elapsed else 0:.0f} docs/s)")
+
+    async def seed_user(i):
+        user_id = f"{prefix}-{i:05d}"
+        log_docs, total_docs = build_user(matrix, descriptions, user_id, dates, items_mean,
+                                          grams_min, grams_max, skip_prob, np.random.default_rng(seeds[i]))
+        async with semaphore:
+            # refazer o seed do mesmo usuário substitui o período, não duplica
+            await asyncio.gather(
+                hist_log_coll.delete_many({"user_id": user_id, "date": date_range}),
+                hist_intake_coll.delete_many({"user_id": user_id, "date": date_range})
+            )
+            writes = []
+            if log_docs:
+                writes.append(hist_log_coll.insert_many(log_docs, ordered=False))
+            if total_docs:
+                writes.append(hist_intake_coll.bulk_write(
+                    [UpdateOne({"user_id": user_id, "date": total["date"]}, {"$set": total}, upsert=True)
+                     for total in total_docs],
+                    ordered=False
+                ))
+            await asyncio.gather(*writes)
+        stats["users"] += 1
+        stats["logs"] += len(log_docs)
+        stats["totals"] += len(total_docs)
+        if stats["users"] % 100 == 0:
+            report("progresso")
+
+    await asyncio.gather(*(seed_user(i) for i in range(n_users)))
+    report("concluído")
+    return stats
+
 # -----------------------
 # Main
 # -----------------------
@@ -80,6 +213,10 @@ async def main():
     random_seed = os.getenv("RANDOM_SEED")
     if random_seed is not None:
         random.seed(int(random_seed))
+    seed_users  = int(os.getenv("SEED_USERS", "0"))
+    concurrency = int(os.getenv("SEED_CONCURRENCY", "8"))
+    user_prefix = os.getenv("USER_ID_PREFIX", "seed-user")
+    skip_prob   = float(os.getenv("SKIP_DAY_PROB", "0.1"))
 
     if not mongo_uri or not db_name:
         raise RuntimeError("Defina MONGO_URI e DB_NAME no ambiente (.env).")
@@ -104,6 +241,18 @@ async def main():
 
     today = datetime.date.today()
 
+    if seed_users > 0:
+        dates = [(today - datetime.timedelta(days=(seed_days - 1 - delta))).strftime("%Y-%m-%d")
+                 for delta in range(seed_days)]
+        print(f"Semeando {seed_users} usuários ({seed_days} dias, concorrência {concurrency})...")
+        stats = await seed_many_users(
+            foods, hist_intake_coll, hist_log_coll, seed_users, dates, items_day, grams_min, grams_max,
+            skip_prob, concurrency, user_prefix, int(random_seed) if random_seed is not None else None
+        )
+        print(f"\nConcluído!\nItens inseridos em historical_food_log: {stats['logs']}")
+        print(f"Totais upsertados em historical_intake: {stats['totals']}")
+        return
+
     # Para evitar explosionar/duplicar dados, opcionalmente limpamos o período antes (comente se não quiser)
     # ATENÇÃO: isso apaga SEU histórico desse user no range!
     start_date = today - datetime.timedelta(days=seed_days-1)
@@ -126,61 +275,14 @@ async def main():
         the_date = today - datetime.timedelta(days=(seed_days - 1 - delta))
         date_str = the_date.strftime("%Y-%m-%d")
 
-        # escolhe itens distintos para o dia
-        day_foods = random.sample(foods, items_day)
-
-        # acumula totais do dia
-        t_cal = 0.0
-        t_pro = 0.0
-        t_carb = 0.0
-        t_gor = 0.0
+        bulk_logs, total_doc = build_day(foods, user_id, date_str, items_day, grams_min, grams_max)
 
         # insere itens no historical_food_log
-        bulk_logs = []
-        for food in day_foods:
-            grams = random.randint(grams_min, grams_max)
-
-            cal_per_g  = coerce_float(food.get("calorias_kcal"), 0.0)
-            pro_per_g  = coerce_float(food.get("proteinas_g"),   0.0)
-            carb_per_g = coerce_float(food.get("carbo_g"),       0.0)
-            gor_per_g  = coerce_float(food.get("gordura_g"),     0.0)
-
-            cal  = cal_per_g  * grams
-            pro  = pro_per_g  * grams
-            carb = carb_per_g * grams
-            gor  = gor_per_g  * grams
-
-            t_cal += cal
-            t_pro += pro
-            t_carb += carb
-            t_gor += gor
-
-            log_doc = {
-                "_id": ObjectId(),  # mantém compatível com seu endpoint
-                "user_id": user_id,
-                "description": food.get("description", "item"),
-                "grams": grams,
-                "calorias": f1(cal),       # uma casa fica legal no tooltip
-                "proteinas": f2(pro),
-                "carbo": f2(carb),
-                "gordura": f2(gor),
-                "date": date_str
-            }
-            bulk_logs.append(log_doc)
-
         if bulk_logs:
             await hist_log_coll.insert_many(bulk_logs)
             inserted_logs += len(bulk_logs)
 
         # upsert do total do dia em historical_intake
-        total_doc = {
-            "user_id": user_id,
-            "date": date_str,
-            "calorias": f1(t_cal),
-            "proteinas": f2(t_pro),
-            "carbo": f2(t_carb),
-            "gordura": f2(t_gor),
-        }
         await hist_intake_coll.update_one(
             {"user_id": user_id, "date": date_str},
             {"$set": total_doc},
@@ -0,0 +1,268 @@
+"""
+Índice de busca em memória usado pelo /search/combined.
+
+Mantém, para cada documento, o texto já normalizado e o payload de resposta,
+além de dois índices invertidos:
+- tokens  -> ids (palavras do texto normalizado)
+- trigramas -> ids (janelas de 3 caracteres, incluindo espaços)
+
+Assim a busca não precisa varrer a coleção inteira no Mongo a cada tecla.
+
+Os resultados são pontuados por tipo de casamento:
+exato > prefixo > prefixo de palavra > substring > aproximado (pela distância).
+Cada faixa tem o seu conjunto de candidatos (primeira palavra, palavras,
+trigramas, árvore BK) e a busca para na faixa que completa `limit`: uma
+consulta curta e ampla ("ar") pontua os prefixos, não todas as substrings.
+
+A busca aproximada é por palavra: cada palavra da consulta é trocada pelas
+palavras do vocabulário a até k edições (árvore BK; a última palavra, que pode
+estar pela metade, casa com o começo de uma palavra) e as listas de documentos
+de cada uma são intersectadas. Um erro na segunda palavra ("arroz integrl")
+também é encontrado, e o custo depende do vocabulário, não do número de linhas.
+"""
+
+import heapq
+from fuzzy import BKTree, MyersMatcher, bounded_levenshtein
+
+SCORE_EXACT = 100
+SCORE_PREFIX = 80
+SCORE_TOKEN_PREFIX = 60
+SCORE_SUBSTRING = 40
+SCORE_FUZZY = 20
+FUZZY_DISTANCE_PENALTY = 5
+
+
+def rank_key(result: tuple[float, str, dict]):
+    # maior score primeiro; no empate, o texto mais curto e depois a ordem alfabética
+    score, normalized, _ = result
+    return -score, len(normalized), normalized
+
+
+def trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def match_score(query: str, normalized: str, distance: int | None = None) -> float:
+    if distance is not None:
+        return SCORE_FUZZY - FUZZY_DISTANCE_PENALTY * distance
+    if normalized == query:
+        return SCORE_EXACT
+    if normalized.startswith(query):
+        return SCORE_PREFIX
+    if (" " + query) in normalized:
+        return SCORE_TOKEN_PREFIX
+    return SCORE_SUBSTRING
+
+
+def token_max_distance(token: str, max_distance: int = 2) -> int:
+    # palavras curtas toleram menos erros: "sal" a 2 edições casaria com quase tudo
+    if len(token) < 3:
+        return 0
+    return min(max_distance, 1 if len(token) < 6 else 2)
+
+
+def token_match_distance(query: str, normalized: str, max_distance: int = 2) -> int | None:
+    """Soma das distâncias por palavra entre `query` e `normalized` (None se alguma não casa)."""
+    query_tokens = query.split()
+    doc_tokens = set(normalized.split())
+    if not query_tokens or not doc_tokens:
+        return None
+    total = 0
+    for position, token in enumerate(query_tokens):
+        k = token_max_distance(token, max_distance)
+        if position == len(query_tokens) - 1:
+            matcher = MyersMatcher(token)
+            distances = [matcher.min_prefix_distance(doc_token, k) for doc_token in doc_tokens]
+        else:
+            distances = [bounded_levenshtein(token, doc_token, k) for doc_token in doc_tokens]
+        distances = [d for d in distances if d is not None]
+        if not distances:
+            return None
+        total += min(distances)
+    return total
+
+
+def could_match(query: str, normalized: str, max_distance: int = 2) -> bool:
+    """Se `normalized` apareceria nos resultados de `query` (mesma regra de search)."""
+    return query in normalized or token_match_distance(query, normalized, max_distance) is not None
+
+
+class SearchIndex:
+    def __init__(self):
+        # id -> (texto normalizado, payload, dono, palavras indexadas)
+        self._docs: dict[str, tuple[str, dict, str | None, frozenset[str]]] = {}
+        self._tokens: dict[str, set[str]] = {}
+        # primeira palavra do texto -> ids (candidatos a exato/prefixo)
+        self._first_tokens: dict[str, set[str]] = {}
+        self._trigrams: dict[str, set[str]] = {}
+        # vocabulário para a busca aproximada; palavras que deixam de existir
+        # ficam na árvore e são ignoradas (o índice é reconstruído de tempos em tempos)
+        self._vocabulary = BKTree()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._docs
+
+    def add(self, doc_id: str, normalized: str, payload: dict, owner: str | None = None,
+            tokens: list[str] | None = None):
+        if doc_id in self._docs:
+            self.remove(doc_id)
+        # guarda as palavras indexadas: remove() tira exatamente estas, mesmo que
+        # os tokens gravados no documento não sejam normalized.split()
+        tokens = frozenset(normalized.split() if tokens is None else tokens)
+        self._docs[doc_id] = (normalized, payload, owner, tokens)
+        for token in tokens:
+            postings = self._tokens.get(token)
+            if postings is None:
+                postings = self._tokens[token] = set()
+                self._vocabulary.add(token)
+            postings.add(doc_id)
+        for token in normalized.split()[:1]:
+            self._first_tokens.setdefault(token, set()).add(doc_id)
+        for gram in trigrams(normalized):
+            self._trigrams.setdefault(gram, set()).add(doc_id)
+
+    def remove(self, doc_id: str):
+        entry = self._docs.pop(doc_id, None)
+        if entry is None:
+            return
+        normalized, _, _, tokens = entry
+        for token in tokens:
+            _discard(self._tokens, token, doc_id)
+        for token in normalized.split()[:1]:
+            _discard(self._first_tokens, token, doc_id)
+        for gram in trigrams(normalized):
+            _discard(self._trigrams, gram, doc_id)
+
+    def search(self, query: str, limit: int, max_distance: int = 2,
+               owner: str | None = None, owner_boost: float = 0.0) -> list[tuple[float, str, dict]]:
+        """
+        Os `limit` melhores casamentos de `query` como (score, texto normalizado,
+        payload), na ordem de rank_key.
+
+        As faixas são percorridas da maior para a menor e a busca para quando
+        o `limit`-ésimo resultado já supera o melhor score possível da próxima
+        faixa (mesmo com o boost): as faixas de baixo nem são levantadas.
+        """
+        boost = owner_boost if owner is not None else 0.0
+        tiers = (
+            (SCORE_EXACT, self._prefix_candidates),
+            (SCORE_TOKEN_PREFIX, self._token_prefix_candidates),
+            (SCORE_SUBSTRING, self.substring_candidates),
+        )
+        results = []
+        seen = set()
+        for best, candidates in tiers:
+            if len(results) >= limit and results[-1][0] > best + boost:
+                return results
+            scored = []
+            for doc_id in candidates(query) - seen:
+                normalized, payload, doc_owner, _ = self._docs[doc_id]
+                score = match_score(query, normalized)
+                if owner is not None and doc_owner == owner:
+                    score += owner_boost
+                scored.append((score, normalized, payload))
+                seen.add(doc_id)
+            results = heapq.nsmallest(limit, results + scored, key=rank_key)
+
+        if len(results) >= limit and results[-1][0] > SCORE_FUZZY + boost:
+            return results
+
+        scored = []
+        for doc_id, distance in self.fuzzy_candidates(query, max_distance).items():
+            if doc_id in seen:
+                continue
+            normalized, payload, doc_owner, _ = self._docs[doc_id]
+            score = match_score(query, normalized, distance)
+            if owner is not None and doc_owner == owner:
+                score += owner_boost
+            scored.append((score, normalized, payload))
+        return heapq.nsmallest(limit, results + scored, key=rank_key)
+
+    def _head_postings(self, query: str, postings: dict[str, set[str]]) -> set[str]:
+        # ids das palavras que podem começar um casamento com `query`: a primeira
+        # palavra dela, se vier outra depois, ou qualquer palavra que comece com ela
+        head, _, rest = query.partition(" ")
+        if rest:
+            return set(postings.get(head, ()))
+        ids = set()
+        for word, word_ids in postings.items():
+            if word.startswith(head):
+                ids |= word_ids
+        return ids
+
+    def _prefix_candidates(self, query: str) -> set[str]:
+        """Ids cujo texto normalizado começa com `query` (inclui o exato)."""
+        ids = self._head_postings(query, self._first_tokens)
+        return {doc_id for doc_id in ids if self._docs[doc_id][0].startswith(query)}
+
+    def _token_prefix_candidates(self, query: str) -> set[str]:
+        """Ids em que alguma palavra depois da primeira começa com `query`."""
+        ids = self._head_postings(query, self._tokens)
+        return {doc_id for doc_id in ids if (" " + query) in self._docs[doc_id][0]}
+
+    def substring_candidates(self, query: str) -> set[str]:
+        """Ids cujo texto normalizado contém `query` (já verificado)."""
+        if len(query) < 3:
+            # consultas curtas não formam trigramas: varre o vocabulário,
+            # que é bem menor que o número de documentos
+            ids = set()
+            for token, postings in self._tokens.items():
+                if query in token:
+                    ids |= postings
+        else:
+            postings = sorted(
+                (self._trigrams.get(gram, set()) for gram in trigrams(query)),
+                key=len
+            )
+            ids = set(postings[0]).intersection(*postings[1:])
+        return {doc_id for doc_id in ids if query in self._docs[doc_id][0]}
+
+    def fuzzy_candidates(self, query: str, max_distance: int = 2) -> dict[str, int]:
+        """
+        Ids em que toda palavra da consulta casa com alguma palavra do texto,
+        com a soma das distâncias (mesma regra de token_match_distance).
+        """
+        query_tokens = query.split()
+        candidates = None
+        for position, token in enumerate(query_tokens):
+            k = token_max_distance(token, max_distance)
+            if position == len(query_tokens) - 1:
+                matches = self._prefix_matches(token, k)
+            else:
+                matches = [(word, d) for word, d in self._vocabulary.search(token, k) if word in self._tokens]
+
+            distances = {}
+            for word, distance in matches:
+                for doc_id in self._tokens[word]:
+                    if distance < distances.get(doc_id, k + 1):
+                        distances[doc_id] = distance
+            if candidates is None:
+                candidates = distances
+            else:
+                candidates = {doc_id: candidates[doc_id] + distance
+                              for doc_id, distance in distances.items() if doc_id in candidates}
+            if not candidates:
+                return {}
+        return candidates or {}
+
+    def _prefix_matches(self, token: str, max_distance: int) -> list[tuple[str, int]]:
+        # a última palavra pode estar pela metade: compara com o começo de cada
+        # palavra do vocabulário (varredura do vocabulário, não dos documentos)
+        matcher = MyersMatcher(token)
+        matches = []
+        for word in self._tokens:
+            distance = matcher.min_prefix_distance(word, max_distance)
+            if distance is not None:
+                matches.append((word, distance))
+        return matches
+
+def _discard(postings: dict[str, set[str]], key: str, doc_id: str):
+    ids = postings.get(key)
+    if ids is None:
+        return
+    ids.discard(doc_id)
+    if not ids:
+        del postings[key]
@@ -0,0 +1,58 @@
+"""
+Coalescência de requisições concorrentes idênticas ("singleflight").
+
+Quem chega primeiro com uma chave executa a função normalmente, sem trocar de
+task (nenhuma latência extra); quem chega com a mesma chave enquanto ela está
+em andamento apenas aguarda o mesmo resultado. Nada fica guardado depois que a
+chamada termina: isto não é cache.
+
+O resultado é compartilhado entre todos os chamadores, então não deve ser
+modificado depois de devolvido.
+"""
+
+import asyncio
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: dict = {}
+        self.calls = 0
+        self.shared = 0
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key, fn):
+        future = self._inflight.get(key)
+        if future is not None:
+            self.shared += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # o líder foi cancelado (e não este chamador): tenta de novo
+                if future.cancelled():
+                    return await self.do(key, fn)
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self.calls += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # evita o aviso "exception was never retrieved" quando ninguém esperava
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "shared": self.shared, "inflight": len(self._inflight)}
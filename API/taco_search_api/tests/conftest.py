@@ -0,0 +1,5 @@
+import os
+import sys
+
+# os módulos da API são importados sem pacote (como no uvicorn main:app)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
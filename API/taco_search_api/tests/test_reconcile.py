@@ -0,0 +1,60 @@
+import asyncio
+import importlib
+import json
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+USER = "u1"
+
+
+@pytest.fixture
+def main(monkeypatch):
+    """main.py importado sobre um Mongo em memória (mongomock-motor)."""
+    import motor.motor_asyncio
+
+    class Client(mongomock_motor.AsyncMongoMockClient):
+        def __init__(self, *args, **kwargs):
+            super().__init__()
+
+    for name, value in {
+        "MONGO_URI": "mongodb://localhost", "DB_NAME": "test", "COLLECTION_NAME": "taco_table",
+        "COLLECTION_NAME1": "daily_intake", "COLLECTION_NAME2": "historical_intake",
+        "COLLECTION_NAME3": "daily_food_log", "COLLECTION_NAME4": "historical_food_log",
+        "COLLECTION_NAME5": "recipes", "FOOD_LOG_STORAGE": "items", "INTAKE_WRITE_BEHIND_MS": "0",
+    }.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setattr(motor.motor_asyncio, "AsyncIOMotorClient", Client)
+    import main
+    return importlib.reload(main)
+
+
+def test_reconcile_skips_day_with_write_in_flight(main, monkeypatch):
+    async def scenario():
+        await main.add_food(main.AddFoodRequest(user_id=USER, description="arroz", grams=100, calorias=50))
+
+        # /food/add parado entre gravar o item e aplicar o $inc nos totais
+        logged, resume = asyncio.Event(), asyncio.Event()
+        record_intake_delta = main.record_intake_delta
+
+        async def paused(*args):
+            logged.set()
+            await resume.wait()
+            await record_intake_delta(*args)
+
+        monkeypatch.setattr(main, "record_intake_delta", paused)
+        adding = asyncio.ensure_future(
+            main.add_food(main.AddFoodRequest(user_id=USER, description="feijão", grams=100, calorias=100))
+        )
+        await logged.wait()
+
+        result = await main.reconcile_intake_totals({"user_id": USER})
+        assert result["unresolved"] == 1
+
+        resume.set()
+        await adding
+        today = await main.get_today_intake(USER)
+        return json.loads(today.body)
+
+    assert asyncio.run(scenario())["calorias"] == 150
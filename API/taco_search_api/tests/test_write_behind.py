@@ -0,0 +1,109 @@
+import asyncio
+
+from nutrition import MACRO_FIELDS
+from write_behind import WriteBehind
+
+KEY = ("u1", "2026-01-01")
+
+
+def macros(calorias: float) -> dict:
+    return {**dict.fromkeys(MACRO_FIELDS, 0.0), "calorias": calorias}
+
+
+class Totals:
+    """Coleção de totais em memória: bulk_write aplica $inc por (user_id, date)."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.docs = {}
+
+    async def bulk_write(self, deltas: dict):
+        if self.fail:
+            raise RuntimeError("bulk_write falhou")
+        for key, delta in deltas.items():
+            total = self.docs.setdefault(key, dict.fromkeys(MACRO_FIELDS, 0.0))
+            for field in MACRO_FIELDS:
+                total[field] += delta[field]
+
+
+def make_writer(items: dict, collections: list[Totals]) -> WriteBehind:
+    async def apply(deltas):
+        # como apply_intake_deltas: coleções independentes, uma pode falhar
+        # depois das outras já terem gravado
+        await asyncio.gather(*(collection.bulk_write(deltas) for collection in collections))
+
+    async def repair(keys):
+        for collection in collections:
+            if collection.fail:
+                raise RuntimeError("repair falhou")
+            for key in keys:
+                collection.docs[key] = macros(sum(items.get(key, [])))
+
+    return WriteBehind(apply, repair, delay=0)
+
+
+def test_partial_failure_is_not_reapplied():
+    async def scenario():
+        items = {KEY: [100.0, 50.0]}
+        daily, historical = Totals(), Totals(fail=True)
+        writer = make_writer(items, [daily, historical])
+        writer.add({KEY: macros(150.0)})
+
+        # historical falha várias vezes seguidas; daily já gravou na primeira
+        for _ in range(3):
+            await writer.flush()
+            try:
+                await writer.repair()
+            except RuntimeError:
+                pass
+        assert daily.docs[KEY]["calorias"] == 150.0
+        assert writer.failures == 1
+
+        historical.fail = False
+        assert await writer.repair() == 1
+        assert daily.docs[KEY]["calorias"] == 150.0
+        assert historical.docs[KEY]["calorias"] == 150.0
+        assert len(writer) == 0 and not writer.has_pending("u1")
+
+    asyncio.run(scenario())
+
+
+def test_flush_coalesces_deltas_per_day():
+    async def scenario():
+        daily = Totals()
+        writer = make_writer({}, [daily])
+        for calorias in (10.0, 20.0, -5.0):
+            writer.add({KEY: macros(calorias)})
+        writer.add({("u2", "2026-01-01"): macros(7.0)})
+
+        assert await writer.flush("u1") == 1
+        assert daily.docs == {KEY: macros(25.0)}
+        assert await writer.flush() == 1
+        assert writer.flushes == 2 and writer.queued == 4
+
+    asyncio.run(scenario())
+
+
+def test_has_pending_only_sees_own_batch_in_flight():
+    async def scenario():
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def apply(deltas):
+            started.set()
+            await release.wait()
+
+        async def repair(keys):
+            pass
+
+        writer = WriteBehind(apply, repair, delay=0)
+        writer.add({("u2", "2026-01-01"): macros(7.0)})
+        flushing = asyncio.ensure_future(writer.flush())
+        await started.wait()
+
+        assert writer.has_pending("u2")
+        assert not writer.has_pending("u1")
+        release.set()
+        assert await flushing == 1
+        assert not writer.has_pending("u2")
+
+    asyncio.run(scenario())
@@ -0,0 +1,23 @@
+from unidecode import unidecode
+import re
+
+
+def normalize_text(text: str) -> str:
+    text = unidecode(text).lower()
+    text = re.sub(r'[^a-z0-9\s]', ' ', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+def search_fields(text: str | None) -> dict:
+    """Campos de busca gravados junto com o documento (TACO e receitas)."""
+    normalized = normalize_text(text or "")
+    return {"search_text": normalized, "search_tokens": normalized.split()}
+
+
+def stored_search_fields(doc: dict, source_field: str) -> tuple[str, list[str]]:
+    # documentos antigos, ainda sem os campos (ver scripts/backfill-search-fields.py)
+    if "search_text" in doc and "search_tokens" in doc:
+        return doc["search_text"], doc["search_tokens"]
+    fields = search_fields(doc.get(source_field))
+    return fields["search_text"], fields["search_tokens"]
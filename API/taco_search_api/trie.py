@@ -0,0 +1,159 @@
+"""
+Trie compactado (radix) para o autocomplete de /search/suggest.
+
+Cada documento entra com uma chave por palavra do texto normalizado: o texto
+inteiro e cada sufixo que começa numa palavra ("arroz integral cozido",
+"integral cozido", "cozido"), então o prefixo casa com o início de qualquer
+palavra. Cada nó guarda os TOP_K melhores documentos da sua subárvore, já
+ordenados: a consulta só desce pelos caracteres do prefixo e devolve a lista
+do nó, sem depender do tamanho do catálogo.
+
+Ordem: primeiro quem começa pelo prefixo (chave = texto inteiro), depois
+textos mais curtos, depois ordem alfabética.
+
+add/remove são incrementais: só os nós no caminho das chaves do documento
+têm o top recalculado.
+"""
+
+from bisect import insort
+
+TOP_K = 20
+
+
+class _Node:
+    __slots__ = ("children", "entries", "top")
+
+    def __init__(self):
+        # primeiro caractere da aresta -> (rótulo da aresta, nó)
+        self.children: dict[str, tuple[str, "_Node"]] = {}
+        # documentos cuja chave termina aqui: doc_id -> rank
+        self.entries: dict = {}
+        self.top: list[tuple[tuple, object]] = []
+
+
+def _offer(top: list, rank: tuple, doc_id, k: int):
+    for i, (current, existing) in enumerate(top):
+        if existing == doc_id:
+            if current <= rank:
+                return
+            del top[i]
+            break
+    if len(top) >= k and (rank, doc_id) >= top[-1]:
+        return
+    insort(top, (rank, doc_id))
+    del top[k:]
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def suggestion_keys(normalized: str) -> list[tuple[str, tuple]]:
+    """(chave, rank) de cada início de palavra de `normalized`."""
+    keys = []
+    for position, char in enumerate(normalized):
+        if char != " " and (position == 0 or normalized[position - 1] == " "):
+            keys.append((normalized[position:], (0 if position == 0 else 1, len(normalized), normalized)))
+    return keys
+
+
+class PrefixTrie:
+    def __init__(self, k: int = TOP_K):
+        self.k = k
+        self._root = _Node()
+        self._docs: dict = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, doc_id) -> bool:
+        return doc_id in self._docs
+
+    def add(self, doc_id, normalized: str, payload: dict):
+        if doc_id in self._docs:
+            self.remove(doc_id)
+        keys = suggestion_keys(normalized)
+        self._docs[doc_id] = (keys, payload)
+        for key, rank in keys:
+            self._insert(key, rank, doc_id)
+
+    def remove(self, doc_id):
+        entry = self._docs.pop(doc_id, None)
+        if entry is None:
+            return
+        for key, _ in entry[0]:
+            self._delete(key, doc_id)
+
+    def lookup(self, prefix: str, limit: int) -> list[tuple[tuple, dict]]:
+        """Até `limit` (rank, payload) cujo texto tem palavra começando com `prefix`."""
+        node = self._root
+        rest = prefix
+        while rest:
+            child = node.children.get(rest[0])
+            if child is None:
+                return []
+            label, node = child
+            if rest.startswith(label):
+                rest = rest[len(label):]
+            elif label.startswith(rest):
+                rest = ""
+            else:
+                return []
+        return [(rank, self._docs[doc_id][1]) for rank, doc_id in node.top[:limit]]
+
+    def _insert(self, key: str, rank: tuple, doc_id):
+        node = self._root
+        _offer(node.top, rank, doc_id, self.k)
+        rest = key
+        while rest:
+            child = node.children.get(rest[0])
+            if child is None:
+                leaf = _Node()
+                node.children[rest[0]] = (rest, leaf)
+                node = leaf
+                rest = ""
+            else:
+                label, child_node = child
+                common = _common_prefix_length(label, rest)
+                if common < len(label):
+                    # divide a aresta: o nó intermediário cobre a mesma subárvore
+                    middle = _Node()
+                    middle.top = list(child_node.top)
+                    middle.children[label[common]] = (label[common:], child_node)
+                    node.children[rest[0]] = (label[:common], middle)
+                    child_node = middle
+                node = child_node
+                rest = rest[common:]
+            _offer(node.top, rank, doc_id, self.k)
+        node.entries[doc_id] = min(rank, node.entries.get(doc_id, rank))
+
+    def _delete(self, key: str, doc_id):
+        path = [(None, self._root)]
+        node = self._root
+        rest = key
+        while rest:
+            child = node.children.get(rest[0])
+            if child is None or not rest.startswith(child[0]):
+                return
+            label, node = child
+            path.append((rest[0], node))
+            rest = rest[len(label):]
+        node.entries.pop(doc_id, None)
+
+        # recalcula o top de baixo para cima; nós vazios saem da árvore
+        for depth in range(len(path) - 1, -1, -1):
+            first_char, current = path[depth]
+            if depth > 0 and not current.entries and not current.children:
+                del path[depth - 1][1].children[first_char]
+                continue
+            top = []
+            for entry_id, rank in current.entries.items():
+                _offer(top, rank, entry_id, self.k)
+            for _, child_node in current.children.values():
+                for rank, entry_id in child_node.top:
+                    _offer(top, rank, entry_id, self.k)
+            current.top = top
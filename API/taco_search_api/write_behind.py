@@ -0,0 +1,122 @@
+"""
+Write-behind dos totais de ingestão (daily_intake, historical_intake e rollups).
+
+Editar um dia na interface dispara rajadas de /food/update e /food/delete, e
+cada uma esperava os $inc nos totais antes de responder. Com o write-behind, a
+diferença de macros de cada escrita entra num buffer em memória, somada por
+(user_id, date), e um worker em background grava o buffer inteiro com uma só
+chamada a `apply` `delay` segundos depois da primeira pendência: a rajada vira
+um $inc por dia tocado e a escrita responde depois de gravar só o item.
+
+Leitura das próprias escritas: quem lê totais chama flush(user_id) e
+repair(user_id) antes, que gravam na hora as pendências do usuário (e esperam
+um flush em andamento com dias dele).
+
+Falhas: `apply` grava em várias coleções, e parte do lote pode ter entrado
+antes do erro; reaplicar o lote contaria essa parte em dobro. Por isso um lote
+que falha é descartado e os seus dias vão para `repair`, que os recalcula do
+zero a partir dos itens (e é idempotente, então pode ser repetido à vontade).
+
+O buffer é por processo: com vários workers, uma leitura só força as
+pendências do próprio processo; as dos outros aparecem em até `delay`.
+Pendências perdidas num crash são corrigidas pela reconciliação
+(/cron/reconcile), que recalcula os totais a partir dos itens.
+"""
+
+import asyncio
+from nutrition import MACRO_FIELDS
+
+
+class WriteBehind:
+    def __init__(self, apply, repair, delay: float):
+        # apply(deltas: {(user_id, date): {campo: delta}}) grava um lote;
+        # repair(keys: [(user_id, date)]) recalcula dias a partir dos itens
+        self._apply = apply
+        self._repair = repair
+        self.delay = delay
+        self._pending: dict[tuple[str, str], dict] = {}
+        self._inflight: set = set()
+        self._damaged: set = set()
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self.queued = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.failures = 0
+        self.repaired = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, deltas: dict):
+        self.queued += len(deltas)
+        for key, delta in deltas.items():
+            pending = self._pending.setdefault(key, dict.fromkeys(MACRO_FIELDS, 0.0))
+            for field in MACRO_FIELDS:
+                pending[field] += delta[field]
+        self._wakeup.set()
+
+    def has_pending(self, user_id: str) -> bool:
+        # lote em andamento com dias do usuário conta: flush(user_id) espera ele terminar
+        return any(key[0] == user_id for key in (*self._pending, *self._inflight, *self._damaged))
+
+    def is_pending(self, key: tuple[str, str]) -> bool:
+        """Se o dia tem delta ainda não gravado (no buffer ou no lote em andamento)."""
+        return key in self._pending or key in self._inflight
+
+    async def flush(self, user_id: str | None = None) -> int:
+        """Grava as pendências (de um usuário ou todas); devolve quantos dias gravou."""
+        async with self._lock:
+            keys = [key for key in self._pending if user_id is None or key[0] == user_id]
+            if not keys:
+                return 0
+            batch = {key: self._pending.pop(key) for key in keys}
+            self._inflight = set(batch)
+            try:
+                await self._apply(batch)
+            except Exception as e:
+                # parte do lote pode ter sido gravada: descarta e recalcula os dias
+                self.failures += 1
+                self._damaged.update(batch)
+                self._wakeup.set()
+                print(f"[WARN] Falha no write-behind dos totais ({len(batch)} dias para recalcular): {e}")
+                return 0
+            finally:
+                self._inflight = set()
+            self.flushes += 1
+            self.flushed += len(batch)
+            return len(batch)
+
+    async def repair(self, user_id: str | None = None) -> int:
+        """Recalcula os dias de lotes que falharam; devolve quantos."""
+        keys = sorted(key for key in self._damaged if user_id is None or key[0] == user_id)
+        if not keys:
+            return 0
+        self._damaged.difference_update(keys)
+        try:
+            await self._repair(keys)
+        except Exception:
+            # o recálculo não soma nada, então repetir depois é seguro
+            self._damaged.update(keys)
+            self._wakeup.set()
+            raise
+        self.repaired += len(keys)
+        return len(keys)
+
+    async def close(self):
+        await self.flush()
+        await self.repair()
+
+    async def run(self):
+        while True:
+            await self._wakeup.wait()
+            # junta o que chegar durante a espera no mesmo lote
+            await asyncio.sleep(self.delay)
+            self._wakeup.clear()
+            try:
+                # shield: cancelar o worker no shutdown não corta um lote no meio
+                await asyncio.shield(self.flush())
+                await asyncio.shield(self.repair())
+            except Exception as e:
+                print(f"[WARN] Falha ao recalcular totais do write-behind: {e}")
+                await asyncio.sleep(self.delay)